@@ -3,10 +3,24 @@ from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import create_sql_agent
 from langchain_groq import ChatGroq
 from langchain.agents.agent_types import AgentType
+from sqlalchemy.exc import OperationalError, InterfaceError, DisconnectionError
 import json
 import re
 import os
-from constants import GROQ_API_KEY, POSTGRES_URI
+from constants import GROQ_API_KEY, POSTGRES_URI, ROLE_MATCH_THRESHOLD, NAME_DUPLICATE_THRESHOLD, CANDIDATE_FORMAT
+from stats import people_stats
+from similarity import index_person, find_similar_people, find_duplicate_names
+from sessions import is_followup_reference
+from writer import people_writer
+from partitions import partition_manager, location_key
+from database import get_engine, read_router
+from analytics import analytics_snapshot, parse_aggregate_query
+from sqlalchemy import text
+from cache import bump_data_version
+from profiling import span
+from candidates import format_instructions, generate_candidates
+from deadlines import remaining_time, should_stop
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
 llm = ChatGroq(
     model="llama-3.1-8b-instant",
@@ -18,6 +32,14 @@ import re
 from typing import Dict, Any
 from langchain.sql_database import SQLDatabase
 
+def invoke_llm(prompt: str, state: Dict[str, Any] = None):
+    """LLM call bounded by the request's remaining time budget"""
+    timeout = remaining_time(state or {})
+    with span("llm.invoke"):
+        if timeout is None:
+            return llm.invoke(prompt)
+        return llm.invoke(prompt, timeout=timeout)
+
 def safe_json_parse(text: str):
     try:
         return json.loads(text)
@@ -59,14 +81,77 @@ def sql_value(val):
         return "NULL"
     return "'" + val.replace("'", "''") + "'"
 
+def max_lsn(*lsns):
+    known = [lsn for lsn in lsns if lsn is not None]
+    return max(known) if known else None
+
+def count_people_named(name, location, min_lsn=None, timeout=None) -> int:
+    """
+    Exact-name duplicate check, routed to a replica that has replayed min_lsn
+
+    Scoped to the location partition when people is partitioned.
+    """
+    conditions = ["LOWER(name) = LOWER(:name)"]
+    location_filter = partition_manager.location_predicate(location)
+    if location_filter:
+        conditions.insert(0, location_filter)
+
+    def run(conn):
+        with conn.begin():
+            if timeout is not None:
+                conn.execute(text(f"SET LOCAL statement_timeout = {max(int(timeout * 1000), 1)}"))
+            return conn.execute(
+                text(f"SELECT COUNT(*) FROM people WHERE {' AND '.join(conditions)}"),
+                {"name": name}
+            ).scalar()
+
+    return read_router.run_read(run, min_lsn)
+
+def insert_person(row: Dict[str, Any], timeout=None):
+    """Parameterized single-row insert on the primary's pooled engine"""
+    columns = ", ".join(row)
+    placeholders = ", ".join(f":{column}" for column in row)
+    with get_engine().begin() as conn:
+        if timeout is not None:
+            conn.execute(text(f"SET LOCAL statement_timeout = {max(int(timeout * 1000), 1)}"))
+        conn.execute(text(f"INSERT INTO people ({columns}) VALUES ({placeholders})"), row)
+
+def record_person_insert(name, role, location, source=None):
+    """Propagates a successful insert to the in-memory stats, indexes, analytics snapshot and read cache"""
+    people_stats.record_insert(role, source)
+    index_person(name, role, location, source)
+    analytics_snapshot.record_insert(name, role, location, source)
+    bump_data_version()
+
+READ_STOPWORDS = {
+    "show", "list", "display", "get", "give", "find", "who", "what", "are",
+    "is", "all", "me", "the", "our", "in", "from", "of", "a", "an", "any",
+    "people", "database", "team", "records", "existing", "how", "many",
+    "count", "number", "there"
+}
+
+def extract_role_lookup(query: str):
+    """Strips read verbs, filler words and the location from a LOCAL read query"""
+    location = extract_location_fallback(query)
+    if location and location.lower() in READ_STOPWORDS:
+        location = None
+
+    text = query
+    if location:
+        text = re.sub(rf"(?:from|in)\s+{re.escape(location)}", " ", text, flags=re.IGNORECASE)
+
+    words = [
+        w for w in re.findall(r"[A-Za-z.]+", text)
+        if w.lower() not in READ_STOPWORDS
+    ]
+    return " ".join(words) or None, location
+
 def local_db_agent(state: Dict[str, Any]) -> Dict[str, Any]:
     query = state["query"]
 
     try:
-        db = SQLDatabase.from_uri(POSTGRES_URI)
-
         if query.lower().startswith("add"):
-            response = llm.invoke(extract_prompt := f"""
+            response = invoke_llm(extract_prompt := f"""
             Extract structured data.
 
             Query:
@@ -78,7 +163,7 @@ def local_db_agent(state: Dict[str, Any]) -> Dict[str, Any]:
               "role": string | null,
               "location": string | null
             }}
-            """)
+            """, state)
 
             content = (
                 response.content
@@ -86,7 +171,8 @@ def local_db_agent(state: Dict[str, Any]) -> Dict[str, Any]:
                 else str(response)
             ).strip()
 
-            data = safe_json_parse(content)
+            with span("parse"):
+                data = safe_json_parse(content)
             
             name = data.get("name")
             role = data.get("role")
@@ -105,18 +191,35 @@ def local_db_agent(state: Dict[str, Any]) -> Dict[str, Any]:
             role = normalize(role)
             location = normalize(location)
 
-            insert_sql = f"""
-            INSERT INTO people (name, role, location)
-            VALUES (
-                {sql_value(name)},
-                {sql_value(role)},
-                {sql_value(location)}
-            );
-            """
-
-            db.run(insert_sql)
+            # Group-committed with other concurrent inserts; blocks until
+            # this row's batch is committed
+            future = people_writer.submit({
+                "name": name,
+                "role": role,
+                "location": location
+            })
+            try:
+                # Covers the batch window and the commit on the writer
+                # thread, which the sampler does not see
+                with span("db.write_wait"):
+                    commit_lsn = future.result(timeout=remaining_time(state))
+            except FuturesTimeoutError:
+                # The row may still commit after the deadline; keep stats,
+                # indexes and caches in step with it when it does
+                future.add_done_callback(
+                    lambda f: f.exception() is None and record_person_insert(name, role, location)
+                )
+                return {
+                    "final_response": {
+                        "agent": "LOCAL_DB",
+                        "partial": True,
+                        "error": "Insert not confirmed before the request deadline; it may still be committed"
+                    }
+                }
+            record_person_insert(name, role, location)
 
             return {
+                "min_read_lsn": max_lsn(state.get("min_read_lsn"), commit_lsn),
                 "final_response": {
                     "agent": "LOCAL_DB",
                     "message": "Record inserted successfully",
@@ -128,7 +231,52 @@ def local_db_agent(state: Dict[str, Any]) -> Dict[str, Any]:
                 }
             }
 
+        prior_local = state.get("session_local_result")
+        if prior_local and is_followup_reference(query):
+            return {
+                "local_result": prior_local,
+                "final_response": {
+                    "agent": "LOCAL_DB",
+                    "message": "Showing records from earlier in this session",
+                    "data": prior_local
+                }
+            }
+
+        # Counts and group-bys are answered from the columnar snapshot
+        aggregate = parse_aggregate_query(query)
+        if aggregate:
+            with span("analytics"):
+                result = analytics_snapshot.aggregate(aggregate, state.get("min_read_lsn"))
+            return {
+                "local_result": result["rows"],
+                "read_only": True,
+                "final_response": {
+                    "agent": "LOCAL_DB",
+                    "message": f"Aggregated {len(result['rows'])} rows from {result['backend']}",
+                    "data": result["rows"],
+                    "analytics": {
+                        "backend": result["backend"],
+                        "staleness_seconds": result["staleness_seconds"]
+                    }
+                }
+            }
+
+        role_lookup, location = extract_role_lookup(query)
+        if role_lookup:
+            matches = find_similar_people([role_lookup], location, ROLE_MATCH_THRESHOLD, k=10)
+            if matches:
+                return {
+                    "local_result": matches,
+                    "read_only": True,
+                    "final_response": {
+                        "agent": "LOCAL_DB",
+                        "message": f"Found {len(matches)} matching records",
+                        "data": matches
+                    }
+                }
+
         return {
+            "read_only": True,
             "final_response": {
                 "agent": "LOCAL_DB",
                 "message": "No insert operation detected"
@@ -144,11 +292,26 @@ def local_db_agent(state: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def external_search_agent(state: Dict[str, Any]) -> Dict[str, Any]:
-    query = state["query"]
-    try:
-        # Prompt LLM to generate realistic external search results
-        search_prompt = f"""You are an external recruitment database API that searches across multiple platforms (LinkedIn, Indeed, Glassdoor, company databases).
+def session_followup_results(state: Dict[str, Any]):
+    """Prior external candidates of this session when the query refers back to them"""
+    prior = state.get("session_external_result")
+    if prior and is_followup_reference(state["query"]):
+        return prior
+    return None
+
+
+EXTERNAL_SEARCH_EXAMPLES = [
+    {"name": "Priya Sharma", "role": "Senior Machine Learning Engineer", "location": "San Francisco"},
+    {"name": "Michael Chen", "role": "ML Engineer", "location": "San Francisco"}
+]
+
+HYBRID_SEARCH_EXAMPLES = [
+    {"name": "Full Name", "role": "Specific Job Title", "location": "City/Region"}
+]
+
+
+def build_external_search_prompt(query: str, fmt: str = CANDIDATE_FORMAT) -> str:
+    return f"""You are an external recruitment database API that searches across multiple platforms (LinkedIn, Indeed, Glassdoor, company databases).
 
 USER SEARCH QUERY: "{query}"
 
@@ -161,51 +324,76 @@ INSTRUCTIONS:
    - name: Full name (realistic, diverse names)
    - role: Job title matching the query (be specific, include seniority levels)
    - location: City/Region matching the query
-   - source: Always set to "external"
 
 4. Make profiles realistic:
    - Vary seniority levels (Junior, Mid-level, Senior, Lead, Principal)
    - Use realistic name diversity (Indian, Western, Asian names)
    - Match location precisely from query
 
-RESPOND ONLY WITH A JSON ARRAY. NO ADDITIONAL TEXT.
-
-Example format:
-[
-  {{"name": "Priya Sharma", "role": "Senior Machine Learning Engineer", "location": "San Francisco", "source": "external"}},
-  {{"name": "Michael Chen", "role": "ML Engineer", "location": "San Francisco", "source": "external"}}
-]
+{format_instructions(EXTERNAL_SEARCH_EXAMPLES, fmt)}
 
 Generate candidates now:"""
 
+
+def build_hybrid_search_prompt(query: str, fmt: str = CANDIDATE_FORMAT) -> str:
+    return f"""You are a recruitment search engine that searches multiple platforms.
+
+USER QUERY: "{query}"
+
+TASK: Generate 8-10 realistic candidate profiles matching this search query.
+
+REQUIREMENTS:
+1. Extract role and location from the query
+2. Generate diverse candidates with varying experience levels
+3. Use realistic, diverse names from different backgrounds
+4. Each candidate needs: name, role, location
+
+{format_instructions(HYBRID_SEARCH_EXAMPLES, fmt)}
+
+Generate candidates:"""
+
+
+def external_search_agent(state: Dict[str, Any]) -> Dict[str, Any]:
+    query = state["query"]
+
+    prior_results = session_followup_results(state)
+    if prior_results:
+        print(f"[EXTERNAL_SEARCH] Reusing {len(prior_results)} candidates from session")
+        return {
+            "external_result": prior_results,
+            "final_response": {
+                "agent": "EXTERNAL_SEARCH",
+                "found_count": len(prior_results),
+                "results": prior_results,
+                "message": f"Showing {len(prior_results)} candidates from earlier in this session",
+                "query": query
+            }
+        }
+
+    try:
+        # Prompt LLM to generate realistic external search results
+        search_prompt = build_external_search_prompt(query)
+
         print(f"[EXTERNAL_SEARCH] Searching for: {query}")
         
-        response = llm.invoke(search_prompt)
-        response_text = response.content.strip()
+        # Parsed and validated onto the result schema (source = "external")
+        validated_results, partial = generate_candidates(llm, search_prompt, state=state)
         
-        json_match = re.search(r'\[[\s\S]*\]', response_text)
-        if json_match:
-            json_str = json_match.group(0)
-            results = json.loads(json_str)
-        else:
-            # Fallback if JSON parsing fails
-            results = []
-        
-        validated_results = []
-        for candidate in results:
-            if all(key in candidate for key in ["name", "role", "location"]):
-                candidate["source"] = "external"
-                validated_results.append(candidate)
-        
-        print(f"[EXTERNAL_SEARCH] Found {len(validated_results)} candidates")
+        print(f"[EXTERNAL_SEARCH] Found {len(validated_results)} candidates{' (partial)' if partial else ''}")
+
+        message = f"Found {len(validated_results)} candidates from external sources (LinkedIn, Indeed, Glassdoor)"
+        if partial:
+            message += " before the request deadline (partial results)"
         
         return {
             "external_result": validated_results,
+            "partial": partial,
             "final_response": {
                 "agent": "EXTERNAL_SEARCH",
                 "found_count": len(validated_results),
                 "results": validated_results,
-                "message": f"Found {len(validated_results)} candidates from external sources (LinkedIn, Indeed, Glassdoor)",
+                "message": message,
+                "partial": partial,
                 "query": query
             }
         }
@@ -227,199 +415,212 @@ Generate candidates now:"""
         }
 
 
-def hybrid_agent(state: Dict[str, Any]) -> Dict[str, Any]:
-    query = state["query"]
-    
-    try:
-        print(f"HYBRID Starting hybrid operation for: {query}")
-        
-        external_search_prompt = f"""You are a recruitment search engine that searches multiple platforms.
+# Connection-level failures abort the hybrid step so the checkpointed run
+# can be resumed; row-level errors only skip the affected candidate
+RESUMABLE_DB_ERRORS = (OperationalError, InterfaceError, DisconnectionError)
 
-USER QUERY: "{query}"
 
-TASK: Generate 8-10 realistic candidate profiles matching this search query.
-
-REQUIREMENTS:
-1. Extract role and location from the query
-2. Generate diverse candidates with varying experience levels
-3. Use realistic, diverse names from different backgrounds
-4. Each candidate needs: name, role, location, source (set to "external")
+def hybrid_agent(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Hybrid step 1: external candidate generation
 
-OUTPUT: JSON array only, no other text.
+    Failures propagate instead of being turned into an error response, so
+    a retry with the same request id resumes from the last checkpointed
+    step rather than paying for candidate generation again.
+    """
+    query = state["query"]
+    
+    print(f"HYBRID Starting hybrid operation for: {query}")
 
-Format:
-[
-  {{"name": "Full Name", "role": "Specific Job Title", "location": "City/Region", "source": "external"}}
-]
+    prior_results = session_followup_results(state)
+    if prior_results:
+        print(f"HYBRID Reusing {len(prior_results)} candidates from session")
+        return {"external_result": prior_results}
+    
+    external_search_prompt = build_hybrid_search_prompt(query)
 
-Generate candidates:"""
+    external_results, partial = generate_candidates(llm, external_search_prompt, state=state)
+    
+    print(f"HYBRID External search found: {len(external_results)} candidates")
 
-        external_response = llm.invoke(external_search_prompt)
-        external_text = external_response.content.strip()
-        
-        json_match = re.search(r'\[[\s\S]*\]', external_text)
-        if json_match:
-            external_results = json.loads(json_match.group(0))
-        else:
-            external_results = []
-        
-        # Validate external results
-        external_results = [
-            {**r, "source": "external"} 
-            for r in external_results 
-            if all(k in r for k in ["name", "role", "location"])
-        ]
-        
-        print(f"HYBRID External search found: {len(external_results)} candidates")
-        
-        if not external_results:
-            return {
-                "external_result": [],
-                "local_result": None,
-                "final_response": {
-                    "agent": "HYBRID",
-                    "message": "No external results found",
-                    "external_count": 0,
-                    "database_count": 0
-                }
+    # Out of time: hand back what was generated instead of inserting
+    if partial:
+        return {
+            "external_result": external_results,
+            "local_result": None,
+            "partial": True,
+            "final_response": {
+                "agent": "HYBRID",
+                "message": "Request deadline reached during candidate generation; no records inserted",
+                "partial": True,
+                "external_count": len(external_results),
+                "database_count": 0,
+                "all_external_results": external_results[:10]
             }
-        
-        print(" ===== DATABASE OPERATIONS =====")
-        
-        num_to_add = 5
-        if "top 3" in query.lower() or "first 3" in query.lower():
-            num_to_add = 3
-        elif "top 10" in query.lower():
-            num_to_add = 10
-        elif "all" in query.lower():
-            num_to_add = len(external_results)
-        
-        top_results = external_results[:num_to_add]
-        
-        db = SQLDatabase.from_uri(POSTGRES_URI)
-        
-        existing_check_prompt = f"""You are a database query assistant.
+        }
+    
+    if not external_results:
+        return {
+            "external_result": [],
+            "local_result": None,
+            "final_response": {
+                "agent": "HYBRID",
+                "message": "No external results found",
+                "external_count": 0,
+                "database_count": 0
+            }
+        }
 
-TASK: Generate a SQL query to find existing people in the database that match the search criteria.
+    return {"external_result": external_results}
 
-SEARCH QUERY: "{query}"
 
-EXTERNAL CANDIDATES FOUND: {len(external_results)} candidates with roles like "{external_results[0]['role']}" in "{external_results[0]['location']}"
+def hybrid_insert_step(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Hybrid step 2: existing-record check and insertion of the top candidates"""
+    query = state["query"]
+    external_results = state["external_result"]
 
-Generate a SELECT query to find similar people already in our database. Consider:
-- Similar roles (use ILIKE for fuzzy matching)
-- Same location
-- Return: name, role, location
+    print(" ===== DATABASE OPERATIONS =====")
+    
+    num_to_add = 5
+    if "top 3" in query.lower() or "first 3" in query.lower():
+        num_to_add = 3
+    elif "top 10" in query.lower():
+        num_to_add = 10
+    elif "all" in query.lower():
+        num_to_add = len(external_results)
+    
+    top_results = external_results[:num_to_add]
+    
+    # Near-match lookup against the in-memory role index replaces the
+    # LLM-generated ILIKE query
+    print(f"HYBRID Checking existing database records...")
+    candidate_roles = list(dict.fromkeys(r["role"] for r in external_results))
+    existing_records = find_similar_people(
+        candidate_roles,
+        external_results[0]["location"],
+        ROLE_MATCH_THRESHOLD
+    )
+    print(f"HYBRID Found existing records: {len(existing_records)}")
+    
+    print(f"HYBRID Attempting to insert top {num_to_add} external candidates...")
+    
+    inserted_people = []
+    skipped_people = []
+    partial = False
+    read_lsn = state.get("min_read_lsn")
+    
+    # One batched lookup for every candidate instead of a search per insert
+    near_duplicates = find_duplicate_names(
+        [person["name"] for person in top_results],
+        NAME_DUPLICATE_THRESHOLD,
+        [person["location"] for person in top_results]
+    )
+    seen_in_batch = set()
 
-Respond with ONLY the SQL query, no explanation."""
+    for person, near_duplicate in zip(top_results, near_duplicates):
+        if should_stop(state):
+            partial = True
+            print(f"HYBRID Request deadline reached, stopping inserts")
+            break
 
-        existing_query_response = llm.invoke(existing_check_prompt)
-        existing_sql = existing_query_response.content.strip()
-        
-        # Clean SQL query
-        existing_sql = existing_sql.replace("```sql", "").replace("```", "").strip()
-        
         try:
-            print(f"HYBRID Checking existing database records...")
-            existing_records = db.run(existing_sql)
-            print(f"HYBRID Found existing records: {existing_records}")
-        except Exception as e:
-            print(f"HYBRID Error checking existing records: {e}")
-            existing_records = "No existing records found"
-        
-        print(f"HYBRID Attempting to insert top {num_to_add} external candidates...")
-        
-        inserted_count = 0
-        inserted_people = []
-        skipped_people = []
-        
-        for person in top_results:
-            try:
-                check_query = f"""
-                SELECT COUNT(*) FROM people 
-                WHERE LOWER(name) = LOWER('{person["name"].replace("'", "''")}')
-                """
-                existing = db.run(check_query)
-
-                if "0" in str(existing) or existing == 0:
-                    insert_query = """
-                    INSERT INTO people (name, role, location, source)
-                    VALUES ('{name}', '{role}', '{location}', '{source}')
-                    """.format(
-                        name=person["name"].replace("'", "''"),
-                        role=person["role"].replace("'", "''"),
-                        location=person["location"].replace("'", "''"),
-                        source="external"
-                    )
-                    db.run(insert_query)
-                    inserted_count += 1
-                    inserted_people.append(person)
-                    print(f"HYBRID Inserted: {person['name']} - {person['role']}")
-                else:
-                    skipped_people.append(person)
-                    print(f"HYBRID Skipped (duplicate): {person['name']}")
-                    
-            except Exception as e:
-                print(f"HYBRID Error inserting {person['name']}: {str(e)}")
+            # The batched lookup cannot see rows inserted earlier in this loop
+            batch_key = (person["name"].strip().lower(), location_key(person["location"]))
+            if batch_key in seen_in_batch:
                 skipped_people.append(person)
+                print(f"HYBRID Skipped (repeated in batch): {person['name']}")
                 continue
-        
-        summary_prompt = f"""Generate a SQL query to get summary statistics of people in the database.
+            seen_in_batch.add(batch_key)
 
-Return counts by:
-1. Total people
-2. People by source (manual vs external)
-3. Top 3 roles
+            if near_duplicate:
+                skipped_people.append(person)
+                print(f"HYBRID Skipped (near-duplicate of {near_duplicate['name']}): {person['name']}")
+                continue
 
-Respond with ONLY the SQL query."""
+            # Read from a replica only if it has every write this process
+            # (and this request/session) has made
+            with span("db.query"):
+                existing = count_people_named(
+                    person["name"],
+                    person["location"],
+                    max_lsn(read_lsn, read_router.last_write_lsn),
+                    remaining_time(state)
+                )
+
+            if existing == 0:
+                with span("db.write"):
+                    partition_manager.ensure([person["location"]])
+                    # Bounded by the remaining request budget
+                    insert_person({
+                        "name": person["name"],
+                        "role": person["role"],
+                        "location": person["location"],
+                        "source": "external",
+                        **partition_manager.key_values(person["location"])
+                    }, remaining_time(state))
+                    read_lsn = max_lsn(read_lsn, read_router.note_write())
+                record_person_insert(person["name"], person["role"], person["location"], "external")
+                inserted_people.append(person)
+                print(f"HYBRID Inserted: {person['name']} - {person['role']}")
+            else:
+                skipped_people.append(person)
+                print(f"HYBRID Skipped (duplicate): {person['name']}")
 
-        summary_response = llm.invoke(summary_prompt)
-        summary_sql = summary_response.content.strip().replace("```sql", "").replace("```", "").strip()
-        
-        try:
-            db_summary = db.run(summary_sql)
-        except:
-            db_summary = "Summary unavailable"
-        
-        print(f"HYBRID ===== OPERATION COMPLETE =====")
-        print(f"HYBRID External found: {len(external_results)}")
-        print(f"HYBRID Inserted: {inserted_count}")
-        print(f"HYBRID Skipped: {len(skipped_people)}")
-        
-        return {
-            "external_result": external_results,
-            "local_result": existing_records,
-            "final_response": {
-                "agent": "HYBRID",
-                "message": f"Hybrid operation completed successfully",
-                "summary": {
-                    "external_search": {
-                        "total_found": len(external_results),
-                        "searched_platforms": "LinkedIn, Indeed, Glassdoor, Company Databases"
-                    },
-                    "database_operation": {
-                        "existing_similar_records": existing_records,
-                        "new_records_inserted": inserted_count,
-                        "duplicates_skipped": len(skipped_people),
-                        "database_summary": db_summary
-                    }
+        except RESUMABLE_DB_ERRORS:
+            raise
+        except Exception as e:
+            print(f"HYBRID Error inserting {person['name']}: {str(e)}")
+            skipped_people.append(person)
+            continue
+
+    return {
+        "local_result": existing_records,
+        "inserted_people": inserted_people,
+        "skipped_people": skipped_people,
+        "partial": partial,
+        "min_read_lsn": read_lsn
+    }
+
+
+def hybrid_summary_step(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Hybrid step 3: database summary and final response"""
+    external_results = state["external_result"]
+    existing_records = state.get("local_result")
+    inserted_people = state.get("inserted_people") or []
+    skipped_people = state.get("skipped_people") or []
+    partial = bool(state.get("partial"))
+
+    # Served from incrementally maintained counters, no LLM/SQL round trip
+    db_summary = people_stats.summary()
+    
+    print(f"HYBRID ===== OPERATION COMPLETE =====")
+    print(f"HYBRID External found: {len(external_results)}")
+    print(f"HYBRID Inserted: {len(inserted_people)}")
+    print(f"HYBRID Skipped: {len(skipped_people)}")
+    
+    return {
+        "final_response": {
+            "agent": "HYBRID",
+            "message": (
+                "Hybrid operation stopped at the request deadline (partial results)"
+                if partial
+                else f"Hybrid operation completed successfully"
+            ),
+            "partial": partial,
+            "summary": {
+                "external_search": {
+                    "total_found": len(external_results),
+                    "searched_platforms": "LinkedIn, Indeed, Glassdoor, Company Databases"
                 },
-                "inserted_people": inserted_people,
-                "skipped_people": skipped_people,
-                "all_external_results": external_results[:10]  # Show first 10
-            }
-        }
-        
-    except Exception as e:
-        error_msg = f"Hybrid operation failed: {str(e)}"
-        print(f"HYBRID {error_msg}")
-        return {
-            "external_result": None,
-            "local_result": None,
-            "final_response": {
-                "agent": "HYBRID",
-                "error": error_msg
+                "database_operation": {
+                    "existing_similar_records": existing_records,
+                    "new_records_inserted": len(inserted_people),
+                    "duplicates_skipped": len(skipped_people),
+                    "database_summary": db_summary
+                }
             },
-            "error": str(e)
-
+            "inserted_people": inserted_people,
+            "skipped_people": skipped_people,
+            "all_external_results": external_results[:10]  # Show first 10
         }
+    }
@@ -0,0 +1,380 @@
+from typing import Dict, Any, List, Optional
+from sqlalchemy import text
+import duckdb
+import re
+import threading
+import time
+
+from constants import ANALYTICS_DB_PATH, ANALYTICS_MAX_STALENESS_SECONDS, ANALYTICS_REFRESH_INTERVAL
+from database import read_router
+from partitions import KEY_COLUMN, UNKNOWN_LOCATION, location_key, partition_manager
+from stats import DEFAULT_SOURCE
+from cache import bump_data_version
+
+REFRESH_BATCH_SIZE = 50000
+
+# Query words mapped onto the columns aggregate questions can group by
+DIMENSIONS = {
+    "location": "location", "locations": "location", "city": "location",
+    "cities": "location", "place": "location", "places": "location",
+    "role": "role", "roles": "role", "title": "role", "titles": "role",
+    "position": "role", "positions": "role", "job": "role", "jobs": "role",
+    "source": "source", "sources": "source",
+}
+
+DIMENSION_WORDS = "|".join(sorted(DIMENSIONS, key=len, reverse=True))
+DIMENSION_PATTERN = re.compile(rf"\b({DIMENSION_WORDS})\b")
+# "by role and location" / "per city, source" group by every listed dimension
+GROUP_PATTERN = re.compile(
+    rf"\b(?:by|per|each|every|across|group(?:ed)? by)\s+"
+    rf"((?:{DIMENSION_WORDS})\b(?:\s*(?:,|and|&)\s*(?:{DIMENSION_WORDS})\b)*)"
+)
+TOP_PATTERN = re.compile(rf"\b(?:top|most common|most frequent)\s+(?:(\d+)\s+)?({DIMENSION_WORDS})\b")
+COUNT_PATTERN = re.compile(r"\b(?:count|how many|number of|total|breakdown|distribution|top|most common|most frequent)\b")
+LOCATION_PATTERN = re.compile(r"\b(?:in|from)\s+([a-z][a-z.'-]*(?:\s+[a-z][a-z.'-]*)*)", re.IGNORECASE)
+# Words that end (or, leading, rule out) a location: "in pune by role",
+# "in the database", "in each city", "in total"
+LOCATION_STOPWORDS = set(DIMENSIONS) | {
+    "by", "per", "each", "every", "across", "group", "grouped", "and", "with",
+    "for", "who", "that", "where", "sorted", "ordered", "the", "our", "all",
+    "total", "database", "db", "team", "system", "records", "there", "it",
+    "people", "persons", "employees", "candidates", "are", "is", "we", "have"
+}
+# "how many ML engineers are in Pune" -> role filter "ml engineers"
+ROLE_COUNT_PATTERN = re.compile(
+    r"\b(?:how many|count(?: of)?|number of|total(?: number of)?)\s+([a-z][a-z./+-]*(?:\s+[a-z][a-z./+-]*)*)"
+)
+ROLE_STOPWORDS = LOCATION_STOPWORDS | {
+    "in", "from", "at", "of", "do", "does", "did", "has", "work", "works",
+    "working", "them", "those", "these", "you", "i", "currently"
+}
+
+
+def extract_location(query: str) -> Optional[str]:
+    """Location after in/from in any case, cut at the first stopword ("in new delhi by role" -> "new delhi")"""
+    for match in LOCATION_PATTERN.finditer(query):
+        words = []
+        for word in match.group(1).split():
+            if word.lower().strip(".'-") in LOCATION_STOPWORDS:
+                break
+            words.append(word)
+        if words:
+            return " ".join(words)
+    return None
+
+
+def extract_role_filter(lowered: str) -> Optional[str]:
+    """Role named right after the count phrase, singularized for substring matching"""
+    match = ROLE_COUNT_PATTERN.search(lowered)
+    if not match:
+        return None
+
+    words = []
+    for word in match.group(1).split():
+        if word in ROLE_STOPWORDS:
+            break
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words) or None
+
+
+def parse_aggregate_query(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Recognizes count/group-by questions about people
+
+    "count people by location"  -> group by location
+    "top 3 roles by source"     -> top 3 roles within each source
+    "how many people in Pune"   -> total, filtered to one location
+    "how many engineers in Pune" -> total, filtered to a role and location
+    Returns None for anything that is not an aggregate.
+    """
+    lowered = query.lower()
+    if not COUNT_PATTERN.search(lowered):
+        return None
+
+    group_by = [
+        DIMENSIONS[word]
+        for listed in GROUP_PATTERN.findall(lowered)
+        for word in DIMENSION_PATTERN.findall(listed)
+    ]
+    top = TOP_PATTERN.search(lowered)
+    ranked = DIMENSIONS[top.group(2)] if top else None
+    limit = int(top.group(1)) if top and top.group(1) else (3 if top else None)
+
+    location = extract_location(query)
+    role = extract_role_filter(lowered)
+
+    if not group_by and not ranked and not role and not re.search(r"\b(?:people|persons|records|employees|candidates)\b", lowered):
+        return None
+
+    return {
+        "group_by": list(dict.fromkeys(d for d in group_by if d != ranked)),
+        "ranked": ranked,
+        "limit": limit,
+        "location": location,
+        "role": role
+    }
+
+
+def location_label(key: Optional[str]) -> Optional[str]:
+    """Display value for a location key: new_delhi -> New Delhi"""
+    if not key or key == UNKNOWN_LOCATION:
+        return None
+    return " ".join(word.capitalize() for word in key.split("_"))
+
+
+def dimension_sql(dimension: str, key_sql: str = KEY_COLUMN) -> str:
+    if dimension == "source":
+        return f"COALESCE(source, '{DEFAULT_SOURCE}')"
+    if dimension == "location":
+        return key_sql
+    return dimension
+
+
+def aggregate_sql(spec: Dict[str, Any], key_sql: str = KEY_COLUMN) -> str:
+    """
+    Builds the aggregate statement; the same SQL runs on DuckDB and Postgres
+
+    Locations are filtered and grouped on their normalized key (key_sql),
+    so "New-Delhi" and "new delhi" count as one place on every backend.
+    With a ranked dimension and group_by, returns the top `limit` values of
+    the ranked dimension within each group (window function); with only a
+    ranked dimension, the overall top `limit`.
+    """
+    conditions = []
+    if spec.get("location"):
+        conditions.append(f"{key_sql} = '{location_key(spec['location'])}'")
+    if spec.get("role"):
+        # Every word must appear ("sale rep" matches "Sales Representative");
+        # words are limited to [a-z./+-], so they are safe to inline
+        conditions += [f"role ILIKE '%{word}%'" for word in spec["role"].split()]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    group_by = spec["group_by"]
+    ranked = spec["ranked"]
+
+    if ranked and group_by:
+        partition = ", ".join(dimension_sql(d, key_sql) for d in group_by)
+        select = ", ".join(f"{dimension_sql(d, key_sql)} AS {d}" for d in group_by + [ranked])
+        return (
+            f"SELECT {', '.join(group_by + [ranked])}, count FROM ("
+            f"SELECT {select}, COUNT(*) AS count, "
+            f"ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY COUNT(*) DESC, {dimension_sql(ranked, key_sql)}) AS rank "
+            f"FROM people {where} "
+            f"GROUP BY {', '.join(dimension_sql(d, key_sql) for d in group_by + [ranked])}"
+            f") ranked WHERE rank <= {int(spec['limit'])} "
+            f"ORDER BY {', '.join(group_by)}, count DESC"
+        )
+
+    dimensions = group_by + ([ranked] if ranked else [])
+    if not dimensions:
+        return f"SELECT COUNT(*) AS count FROM people {where}"
+
+    select = ", ".join(f"{dimension_sql(d, key_sql)} AS {d}" for d in dimensions)
+    limit = f"LIMIT {int(spec['limit'])}" if ranked else ""
+    return (
+        f"SELECT {select}, COUNT(*) AS count FROM people {where} "
+        f"GROUP BY {', '.join(dimension_sql(d, key_sql) for d in dimensions)} "
+        f"ORDER BY count DESC, {', '.join(dimensions)} {limit}"
+    )
+
+
+class AnalyticsSnapshot:
+    """
+    Columnar copy of people in an embedded DuckDB file for aggregate queries
+
+    refresh() reloads the whole table (from a replica when available) into
+    a staging table and swaps it in; record_insert() appends rows written
+    by this process in between, so only writes made elsewhere wait for the
+    next refresh. Queries are answered from the snapshot while it is at
+    most max_staleness seconds behind its last refresh; otherwise they go
+    to Postgres and a background refresh is started. A row committed in
+    the instant between a refresh starting and its copy query can be
+    counted twice until the following refresh.
+    """
+
+    def __init__(
+        self,
+        path: str = ANALYTICS_DB_PATH,
+        max_staleness: float = ANALYTICS_MAX_STALENESS_SECONDS
+    ):
+        self.path = path
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._conn = None
+        self._snapshot_at: Optional[float] = None
+        self._rows = 0
+        self._last_refresh_seconds: Optional[float] = None
+        # Rows appended while a refresh is copying; re-applied after the swap
+        self._pending: List[tuple] = []
+        self._queries = {"snapshot": 0, "postgres": 0}
+
+    def _connection(self):
+        if self._conn is None:
+            try:
+                self._conn = duckdb.connect(self.path)
+            except duckdb.IOException as e:
+                # Another worker holds the file lock; keep a private copy
+                print(f"ANALYTICS Cannot open {self.path} ({e}), using an in-memory snapshot")
+                self._conn = duckdb.connect(":memory:")
+        return self._conn
+
+    def staleness(self) -> Optional[float]:
+        if self._snapshot_at is None:
+            return None
+        return time.time() - self._snapshot_at
+
+    def is_fresh(self) -> bool:
+        staleness = self.staleness()
+        return staleness is not None and staleness <= self.max_staleness
+
+    def refresh(self) -> bool:
+        """Rebuilds the snapshot from Postgres; concurrent calls are skipped"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+
+        try:
+            started = time.time()
+            with self._lock:
+                cursor = self._connection().cursor()
+                self._pending = []
+            cursor.execute("DROP TABLE IF EXISTS people_next")
+            cursor.execute(
+                "CREATE TABLE people_next (name VARCHAR, role VARCHAR, location VARCHAR, "
+                "source VARCHAR, location_key VARCHAR)"
+            )
+
+            def copy(conn):
+                copied = 0
+                result = conn.execution_options(stream_results=True).execute(text(
+                    "SELECT name, role, location, source FROM people"
+                ))
+                for rows in result.partitions(REFRESH_BATCH_SIZE):
+                    cursor.executemany(
+                        "INSERT INTO people_next VALUES (?, ?, ?, ?, ?)",
+                        [(name, role, location, source, location_key(location))
+                         for name, role, location, source in rows]
+                    )
+                    copied += len(rows)
+                return copied
+
+            copied = read_router.run_read(copy, read_router.last_write_lsn)
+
+            with self._lock:
+                previous_rows = self._rows
+                cursor.execute("BEGIN TRANSACTION")
+                cursor.execute("DROP TABLE IF EXISTS people")
+                cursor.execute("ALTER TABLE people_next RENAME TO people")
+                if self._pending:
+                    cursor.executemany("INSERT INTO people VALUES (?, ?, ?, ?, ?)", self._pending)
+                cursor.execute("COMMIT")
+                self._rows = copied + len(self._pending)
+                self._pending = []
+                self._snapshot_at = started
+                self._last_refresh_seconds = time.time() - started
+
+            # Rows written elsewhere showed up; cached aggregates are stale
+            if self._rows != previous_rows:
+                bump_data_version()
+
+            print(f"ANALYTICS Snapshot refreshed: {copied} rows in {self._last_refresh_seconds:.2f}s")
+            return True
+        except Exception as e:
+            print(f"ANALYTICS Snapshot refresh failed: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_in_background(self):
+        if not self._refresh_lock.locked():
+            threading.Thread(target=self.refresh, name="analytics-refresh", daemon=True).start()
+
+    def record_insert(self, name: str, role: Optional[str], location: Optional[str], source: Optional[str] = None):
+        row = (name, role, location, source, location_key(location))
+        try:
+            with self._lock:
+                if self._refresh_lock.locked():
+                    self._pending.append(row)
+                if self._snapshot_at is None:
+                    return
+                self._connection().execute("INSERT INTO people VALUES (?, ?, ?, ?, ?)", list(row))
+                self._rows += 1
+        except Exception as e:
+            print(f"ANALYTICS Append failed: {e}")
+
+    def _query_snapshot(self, sql: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._connection().cursor()
+        cursor.execute(sql)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def aggregate(self, spec: Dict[str, Any], min_lsn: Optional[int] = None) -> Dict[str, Any]:
+        """Runs an aggregate spec on the snapshot if fresh enough, else on Postgres"""
+        if self.is_fresh():
+            rows = self._query_snapshot(aggregate_sql(spec))
+            backend = "snapshot"
+        else:
+            self.refresh_in_background()
+            sql = aggregate_sql(spec, partition_manager.key_sql())
+            rows = read_router.run_read(
+                lambda conn: [dict(row) for row in conn.execute(text(sql)).mappings().all()],
+                min_lsn
+            )
+            backend = "postgres"
+
+        for row in rows:
+            if "location" in row:
+                row["location"] = location_label(row["location"])
+
+        self._queries[backend] += 1
+        staleness = self.staleness()
+        return {
+            "rows": rows,
+            "backend": backend,
+            "staleness_seconds": round(staleness, 1) if backend == "snapshot" else 0
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        staleness = self.staleness()
+        return {
+            "rows": self._rows,
+            "staleness_seconds": round(staleness, 1) if staleness is not None else None,
+            "max_staleness_seconds": self.max_staleness,
+            "last_refresh_seconds": self._last_refresh_seconds,
+            "queries": dict(self._queries)
+        }
+
+
+analytics_snapshot = AnalyticsSnapshot()
+
+_refresh_thread: Optional[threading.Thread] = None
+_refresh_stop = threading.Event()
+
+
+def _refresh_loop(interval: float):
+    analytics_snapshot.refresh()
+    while not _refresh_stop.wait(interval):
+        analytics_snapshot.refresh()
+
+
+def start_snapshot_refresh(interval: float = ANALYTICS_REFRESH_INTERVAL):
+    """Starts the periodic snapshot refresh (no-op if disabled or already running)"""
+    global _refresh_thread
+
+    if interval <= 0 or (_refresh_thread and _refresh_thread.is_alive()):
+        return
+
+    _refresh_stop.clear()
+    _refresh_thread = threading.Thread(
+        target=_refresh_loop,
+        args=(interval,),
+        name="analytics-refresh",
+        daemon=True
+    )
+    _refresh_thread.start()
+
+
+def stop_snapshot_refresh():
+    _refresh_stop.set()
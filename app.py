@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import json
+import uuid
 
 API_URL = "http://127.0.0.1:8000/query"
 
@@ -35,19 +36,36 @@ if submit:
     if not query.strip():
         st.warning("Please enter a query.")
     else:
+        if "session_id" not in st.session_state:
+            st.session_state["session_id"] = str(uuid.uuid4())
+
+        # Re-running the same query after a failure reuses its request id,
+        # so the backend resumes from the last completed step
+        if st.session_state.get("last_query") != query:
+            st.session_state["last_query"] = query
+            st.session_state["request_id"] = str(uuid.uuid4())
+
         with st.spinner("Processing your query..."):
             try:
                 response = requests.post(
                     API_URL,
-                    json={"query": query},
+                    json={
+                        "query": query,
+                        "request_id": st.session_state["request_id"],
+                        "session_id": st.session_state["session_id"]
+                    },
                     timeout=120
                 )
 
-                if response.status_code != 200:
+                if response.status_code == 429:
+                    retry_after = response.headers.get("Retry-After", "a few")
+                    st.warning(f"Server is busy. Please retry in {retry_after} seconds.")
+                elif response.status_code != 200:
                     st.error(f"API Error: {response.status_code}")
                     st.text(response.text)
                 else:
                     data = response.json()
+                    st.session_state.pop("last_query", None)
 
           
                     st.success("Query processed successfully")
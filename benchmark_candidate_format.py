@@ -0,0 +1,106 @@
+"""
+Compares the compact (name|role|location) and JSON candidate formats
+
+Runs the external search and hybrid generation prompts against the live
+LLM in both formats and reports output tokens, total latency, time to
+the first parsed candidate and candidates parsed per run. Latency comes
+from a streamed run; output tokens from a separate non-streamed run,
+since the Groq client only reports token usage on invoke().
+
+Usage:
+    python benchmark_candidate_format.py --runs 5
+    python benchmark_candidate_format.py --query "Find data scientists in Boston"
+"""
+from typing import Dict, Any, List
+import argparse
+import statistics
+import time
+
+from agents import llm, build_external_search_prompt, build_hybrid_search_prompt
+from candidates import iter_compact_candidates, parse_json_candidates
+
+DEFAULT_QUERIES = [
+    "Find machine learning engineers in San Francisco",
+    "Search for data scientists in Boston and add the top 3 to our database",
+]
+
+
+def run_once(prompt: str, fmt: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    first_candidate_at = None
+    text_parts: List[str] = []
+
+    def stream_text():
+        for chunk in llm.stream(prompt):
+            text_parts.append(chunk.content)
+            yield chunk.content
+
+    if fmt == "compact":
+        candidates = []
+        for candidate in iter_compact_candidates(stream_text()):
+            if first_candidate_at is None:
+                first_candidate_at = time.perf_counter()
+            candidates.append(candidate)
+    else:
+        for _ in stream_text():
+            pass
+        candidates = parse_json_candidates("".join(text_parts))
+        # JSON can only be parsed once the closing bracket has arrived
+        first_candidate_at = time.perf_counter() if candidates else None
+
+    finished = time.perf_counter()
+    text = "".join(text_parts)
+
+    usage = llm.invoke(prompt).response_metadata.get("token_usage") or {}
+
+    return {
+        "latency_s": finished - started,
+        "first_candidate_s": (first_candidate_at - started) if first_candidate_at else None,
+        "output_tokens": usage.get("completion_tokens"),
+        "output_chars": len(text),
+        "candidates": len(candidates)
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def median(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return statistics.median(values) if values else None
+
+    return {key: median(key) for key in runs[0]}
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "n/a"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="runs per prompt and format")
+    parser.add_argument("--query", action="append", help="query to benchmark (repeatable)")
+    args = parser.parse_args()
+
+    prompt_builders = {
+        "external": build_external_search_prompt,
+        "hybrid": build_hybrid_search_prompt,
+    }
+
+    columns = ["latency_s", "first_candidate_s", "output_tokens", "output_chars", "candidates"]
+    print(f"{'query / prompt':<60} {'format':<8} " + " ".join(f"{c:>18}" for c in columns))
+
+    for query in args.query or DEFAULT_QUERIES:
+        for prompt_name, build_prompt in prompt_builders.items():
+            for fmt in ("json", "compact"):
+                prompt = build_prompt(query, fmt)
+                runs = [run_once(prompt, fmt) for _ in range(args.runs)]
+                medians = summarize(runs)
+                label = f"{query[:48]} / {prompt_name}"
+                print(f"{label:<60} {fmt:<8} " + " ".join(f"{format_value(medians[c]):>18}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import re
+
+from constants import RESULT_CACHE_MAX_ENTRIES
+
+_version_lock = threading.Lock()
+_data_version = 0
+
+
+def current_data_version() -> int:
+    return _data_version
+
+
+def bump_data_version() -> int:
+    """Called on every write to people; invalidates all cached read results"""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        return _data_version
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def compute_etag(payload: Any) -> str:
+    body = json.dumps(payload, sort_keys=True, default=str).encode()
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return "*" in tags or etag in tags
+
+
+class ResultCache:
+    """
+    LRU cache of read-only LOCAL responses, invalidated by data version
+
+    Entries remember the data version they were computed at and are only
+    served while it is still current, so any insert (which bumps the
+    version) implicitly invalidates everything without tracking which
+    queries it affects. The version is per process; writes made by other
+    processes are picked up when stats reconciliation detects drift.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, query: str, **params) -> Tuple:
+        return (normalize_query(query),) + tuple(sorted(params.items()))
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["version"] != current_data_version():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, version: int, payload: Dict[str, Any]) -> Optional[str]:
+        """Stores payload computed at version; returns its ETag (None if already stale)"""
+        if version != current_data_version():
+            return None
+
+        etag = compute_etag(payload)
+        with self._lock:
+            self._entries[key] = {"version": version, "payload": payload, "etag": etag}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "data_version": current_data_version()
+        }
+
+
+result_cache = ResultCache()
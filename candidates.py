@@ -0,0 +1,151 @@
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+import json
+import re
+
+from constants import CANDIDATE_FORMAT
+from profiling import span
+from deadlines import DeadlineExceeded, remaining_time, should_stop
+
+CANDIDATE_FIELDS = ("name", "role", "location")
+
+# Bullets and numbering models like to prepend to each row
+LINE_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+def format_instructions(examples: List[Dict[str, str]], fmt: str = CANDIDATE_FORMAT) -> str:
+    """
+    Output-format section of a candidate generation prompt
+
+    "compact" asks for one name|role|location row per line, which costs
+    far fewer output tokens than a JSON array repeating every key and
+    "source": "external" on every row. "json" is the original format.
+    """
+    if fmt == "json":
+        rows = ",\n".join(
+            "  " + json.dumps({**example, "source": "external"})
+            for example in examples
+        )
+        return f"""RESPOND ONLY WITH A JSON ARRAY. NO ADDITIONAL TEXT.
+Each object has: name, role, location, source (always "external").
+
+Example format:
+[
+{rows}
+]"""
+
+    rows = "\n".join("|".join(example[f] for f in CANDIDATE_FIELDS) for example in examples)
+    return f"""OUTPUT FORMAT: one candidate per line as name|role|location
+No header, no numbering, no JSON, no additional text.
+
+Example:
+{rows}"""
+
+
+def parse_candidate_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parses one compact row; returns None for malformed, header or separator rows"""
+    line = LINE_PREFIX.sub("", line.strip()).strip().strip("`").strip()
+    if "|" not in line:
+        return None
+
+    fields = [field.strip().strip('"*').strip() for field in line.strip("|").split("|")]
+    if len(fields) < len(CANDIDATE_FIELDS):
+        return None
+
+    name, role, location = fields[:len(CANDIDATE_FIELDS)]
+    if not (name and role and location):
+        return None
+    if tuple(f.lower() for f in (name, role, location)) == CANDIDATE_FIELDS:
+        return None
+    if not re.search(r"[A-Za-z]", name):
+        return None
+
+    return {"name": name, "role": role, "location": location, "source": "external"}
+
+
+def iter_compact_candidates(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Yields candidates as soon as each streamed line is complete"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            candidate = parse_candidate_line(line)
+            if candidate:
+                yield candidate
+
+    candidate = parse_candidate_line(buffer)
+    if candidate:
+        yield candidate
+
+
+def parse_json_candidates(text: str) -> List[Dict[str, Any]]:
+    json_match = re.search(r'\[[\s\S]*\]', text)
+    results = json.loads(json_match.group(0)) if json_match else []
+
+    return [
+        {**r, "source": "external"}
+        for r in results
+        if isinstance(r, dict) and all(k in r for k in CANDIDATE_FIELDS)
+    ]
+
+
+def generate_candidates(
+    llm,
+    prompt: str,
+    fmt: str = CANDIDATE_FORMAT,
+    state: Dict[str, Any] = None
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Runs a candidate generation prompt and maps the output onto the result schema
+
+    The LLM call gets the request's remaining time as its timeout. In
+    compact mode the stream is abandoned as soon as the deadline passes or
+    the client disconnects, keeping the rows parsed so far. Returns
+    (candidates, partial).
+    """
+    state = state or {}
+    timeout = remaining_time(state)
+    llm_kwargs = {"timeout": timeout} if timeout is not None else {}
+
+    if fmt == "json":
+        try:
+            with span("llm.invoke"):
+                response = llm.invoke(prompt, **llm_kwargs)
+        except Exception:
+            if should_stop(state):
+                return [], True
+            raise
+        with span("parse"):
+            return parse_json_candidates(response.content.strip()), False
+
+    received: List[str] = []
+    candidates: List[Dict[str, Any]] = []
+    partial = False
+
+    def stream_text():
+        for chunk in llm.stream(prompt, **llm_kwargs):
+            if should_stop(state):
+                raise DeadlineExceeded("Stopped candidate generation")
+            received.append(chunk.content)
+            yield chunk.content
+
+    with span("llm.stream"):
+        try:
+            # Raising out of the stream skips the (possibly truncated) last line
+            for candidate in iter_compact_candidates(stream_text()):
+                candidates.append(candidate)
+        except DeadlineExceeded:
+            partial = True
+        except Exception:
+            if not should_stop(state):
+                raise
+            partial = True
+
+    # Models occasionally ignore the compact format and answer in JSON
+    if not candidates and not partial:
+        try:
+            candidates = parse_json_candidates("".join(received))
+        except ValueError:
+            candidates = []
+
+    return candidates, partial
@@ -5,3 +5,62 @@ load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 POSTGRES_URI = os.getenv("POSTGRES_URI")
+
+# Seconds between reconciliations of the in-memory people stats (0 disables)
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "300"))
+
+# Cosine similarity cut-offs for the n-gram role/name indexes
+ROLE_MATCH_THRESHOLD = float(os.getenv("ROLE_MATCH_THRESHOLD", "0.65"))
+NAME_DUPLICATE_THRESHOLD = float(os.getenv("NAME_DUPLICATE_THRESHOLD", "0.9"))
+
+# SQLite file holding LangGraph step checkpoints for resumable requests
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite")
+# Checkpoints of requests idle longer than this are deleted, checked every CHECKPOINT_PRUNE_INTERVAL seconds (0 disables)
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", "86400"))
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "3600"))
+
+# Conversational sessions: idle lifetime (seconds) and max sessions kept in memory
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+
+# Admission control: per-intent queue bounds, concurrency limits and fair-share weights
+INTENT_LIMITS = {
+    "LOCAL": {"max_concurrency": 8, "max_queue": 100, "weight": 4},
+    "EXTERNAL": {"max_concurrency": 4, "max_queue": 40, "weight": 2},
+    "HYBRID": {"max_concurrency": 2, "max_queue": 20, "weight": 1},
+}
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "10"))
+SCHEDULER_QUEUE_TIMEOUT = float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", "30"))
+
+# Group commit for single-record inserts: batching window and max rows per transaction
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "5"))
+WRITE_BATCH_MAX_SIZE = int(os.getenv("WRITE_BATCH_MAX_SIZE", "64"))
+
+# Max read-only LOCAL responses kept in the version-invalidated result cache
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+
+# Request profiling: fraction of /query/detailed calls profiled automatically, and sampler interval
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+# Candidate generation output: "compact" (name|role|location lines) or "json"
+CANDIDATE_FORMAT = os.getenv("CANDIDATE_FORMAT", "compact").lower()
+
+# Request deadlines: default and maximum budget per request, and client disconnect polling interval
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "110"))
+MAX_REQUEST_DEADLINE_SECONDS = float(os.getenv("MAX_REQUEST_DEADLINE_SECONDS", "300"))
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+# Location partitioning of people: "list" (one partition per location) or "hash"
+PEOPLE_PARTITION_SCHEME = os.getenv("PEOPLE_PARTITION_SCHEME", "list")
+PEOPLE_HASH_PARTITIONS = int(os.getenv("PEOPLE_HASH_PARTITIONS", "16"))
+
+# Read replicas (comma-separated URIs), maximum tolerated replay lag and health check interval
+POSTGRES_REPLICA_URIS = [uri.strip() for uri in os.getenv("POSTGRES_REPLICA_URIS", "").split(",") if uri.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+# Columnar analytics snapshot (DuckDB) for aggregate LOCAL queries: file, max staleness and refresh interval (0 disables)
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH", "analytics.duckdb")
+ANALYTICS_MAX_STALENESS_SECONDS = float(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", "300"))
+ANALYTICS_REFRESH_INTERVAL = float(os.getenv("ANALYTICS_REFRESH_INTERVAL", "120"))
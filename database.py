@@ -0,0 +1,242 @@
+from typing import Dict, Any, Callable, List, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+import itertools
+import threading
+import time
+
+from constants import POSTGRES_URI, POSTGRES_REPLICA_URIS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(uri: str = None) -> Engine:
+    """
+    Returns a shared SQLAlchemy engine for the given URI
+
+    Engines own a connection pool, so subsystems that talk to Postgres
+    directly (stats, writers, snapshots) reuse one engine per URI instead
+    of opening a fresh connection on every call.
+    """
+    uri = uri or POSTGRES_URI
+
+    with _engines_lock:
+        engine = _engines.get(uri)
+        if engine is None:
+            engine = create_engine(uri, pool_pre_ping=True)
+            _engines[uri] = engine
+
+    return engine
+
+
+# SQLSTATE of a statement cancelled by statement_timeout or a cancel request
+QUERY_CANCELED = "57014"
+
+
+def is_connection_error(error: OperationalError) -> bool:
+    """True for connection-level failures, False for cancelled statements"""
+    if error.connection_invalidated:
+        return True
+    return getattr(error.orig, "pgcode", None) != QUERY_CANCELED
+
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """Postgres WAL position ("16/B374D848") as a comparable integer"""
+    if not lsn:
+        return None
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class ReplicaStatus:
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.healthy = False
+        self.replay_lsn: Optional[int] = None
+        self.lag_seconds: Optional[float] = None
+        self.lag_bytes: Optional[int] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class ReadRouter:
+    """
+    Sends reads to streaming replicas and writes to the primary
+
+    A monitor thread polls every replica for its replay position and lag.
+    read_engine() round-robins over replicas that are up, within
+    max_lag_seconds and have replayed at least min_lsn; otherwise it
+    returns the primary. Writers report their commit LSN via note_write(),
+    so callers can ask for a replica that already contains their writes
+    (read-your-writes). Without replica URIs everything goes to the primary.
+    """
+
+    def __init__(
+        self,
+        replica_uris: List[str] = POSTGRES_REPLICA_URIS,
+        max_lag_seconds: float = REPLICA_MAX_LAG_SECONDS,
+        check_interval: float = REPLICA_CHECK_INTERVAL
+    ):
+        self.replicas = [ReplicaStatus(uri) for uri in replica_uris]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._cycle = itertools.count()
+        self._last_write_lsn: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    @property
+    def last_write_lsn(self) -> Optional[int]:
+        """Highest commit LSN written through this process"""
+        return self._last_write_lsn
+
+    def primary(self) -> Engine:
+        return get_engine()
+
+    def current_primary_lsn(self) -> Optional[int]:
+        if not self.enabled:
+            return None
+        try:
+            with self.primary().connect() as conn:
+                return parse_lsn(conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar())
+        except Exception as e:
+            print(f"ROUTER Could not read primary WAL position: {e}")
+            return None
+
+    def note_write(self, lsn: Optional[int] = None) -> Optional[int]:
+        """Records a committed write; returns its LSN for read-your-writes tokens"""
+        if not self.enabled:
+            return None
+        if lsn is None:
+            lsn = self.current_primary_lsn()
+        if lsn is not None:
+            with self._lock:
+                if self._last_write_lsn is None or lsn > self._last_write_lsn:
+                    self._last_write_lsn = lsn
+        return lsn
+
+    def check_replicas(self):
+        """
+        Measures each replica against the primary's current WAL position
+
+        A replica counts as caught up only when it has replayed everything
+        the primary has written; otherwise its lag is the age of the last
+        replayed transaction. Comparing receive and replay positions alone
+        cannot tell "caught up" from "WAL receiver disconnected", so a
+        replica without a running WAL receiver is marked down as well.
+        """
+        primary_lsn = self.current_primary_lsn()
+
+        for replica in self.replicas:
+            try:
+                with get_engine(replica.uri).connect() as conn:
+                    replay_lsn, replay_age, receiver = conn.execute(text(
+                        "SELECT pg_last_wal_replay_lsn()::text, "
+                        "COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0), "
+                        "(SELECT COALESCE(status, 'unknown') FROM pg_stat_wal_receiver)"
+                    )).one()
+                replica.replay_lsn = parse_lsn(replay_lsn)
+                if primary_lsn is None or replica.replay_lsn is None:
+                    replica.lag_bytes = None
+                else:
+                    replica.lag_bytes = max(primary_lsn - replica.replay_lsn, 0)
+                replica.lag_seconds = 0.0 if replica.lag_bytes == 0 else float(replay_age)
+
+                if replica.replay_lsn is None:
+                    replica.healthy, replica.error = False, "not in recovery"
+                elif receiver is None:
+                    replica.healthy, replica.error = False, "WAL receiver not running"
+                else:
+                    replica.healthy, replica.error = True, None
+            except Exception as e:
+                replica.healthy = False
+                replica.error = str(e).splitlines()[0]
+            replica.checked_at = time.time()
+
+    def _eligible(self, min_lsn: Optional[int]) -> List[ReplicaStatus]:
+        return [
+            replica for replica in self.replicas
+            if replica.healthy
+            and replica.lag_seconds is not None
+            and replica.lag_seconds <= self.max_lag_seconds
+            and (min_lsn is None or (replica.replay_lsn or 0) >= min_lsn)
+        ]
+
+    def _pick(self, min_lsn: Optional[int]) -> Optional[ReplicaStatus]:
+        eligible = self._eligible(min_lsn)
+        if not eligible:
+            return None
+        return eligible[next(self._cycle) % len(eligible)]
+
+    def read_engine(self, min_lsn: Optional[int] = None) -> Engine:
+        replica = self._pick(min_lsn)
+        return get_engine(replica.uri) if replica else self.primary()
+
+    def run_read(self, fn: Callable[[Any], Any], min_lsn: Optional[int] = None):
+        """
+        Runs fn(connection) on a suitable replica, falling back to the primary
+
+        A replica that fails with a connection-level error is marked down
+        until the next health check and the read is retried on the primary.
+        Cancelled statements (statement_timeout) are raised as they are: the
+        replica is fine, and the caller's time budget is already spent.
+        """
+        replica = self._pick(min_lsn)
+        if replica is None:
+            with self.primary().connect() as conn:
+                return fn(conn)
+
+        try:
+            with get_engine(replica.uri).connect() as conn:
+                return fn(conn)
+        except OperationalError as e:
+            if not is_connection_error(e):
+                raise
+            replica.healthy = False
+            replica.error = str(e).splitlines()[0]
+            print(f"ROUTER Replica read failed, retrying on primary: {replica.error}")
+            with self.primary().connect() as conn:
+                return fn(conn)
+
+    def _monitor(self):
+        self.check_replicas()
+        while not self._stop.wait(self.check_interval):
+            self.check_replicas()
+
+    def start_monitoring(self):
+        """Starts the replica health/lag poller (no-op without replicas)"""
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._monitor, name="replica-monitor", daemon=True)
+        self._thread.start()
+
+    def stop_monitoring(self):
+        self._stop.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "max_lag_seconds": self.max_lag_seconds,
+            "last_write_lsn": self._last_write_lsn,
+            "replicas": [
+                {
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "lag_bytes": replica.lag_bytes,
+                    "replay_lsn": replica.replay_lsn,
+                    "checked_at": replica.checked_at,
+                    "error": replica.error
+                }
+                for replica in self.replicas
+            ]
+        }
+
+
+read_router = ReadRouter()
@@ -0,0 +1,60 @@
+from typing import Dict, Any, Optional, Callable
+from contextvars import ContextVar
+import functools
+import threading
+import time
+
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("cancel_event", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request ran out of time budget or its client went away"""
+
+
+def new_deadline(budget_seconds: float) -> float:
+    # Wall-clock (not monotonic) so the deadline survives in checkpoints
+    return time.time() + budget_seconds
+
+
+def remaining_time(state: Dict[str, Any]) -> Optional[float]:
+    """Seconds left in the request budget, or None when the request has no deadline"""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return None
+    return max(deadline - time.time(), 0.0)
+
+
+def is_cancelled() -> bool:
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def should_stop(state: Dict[str, Any]) -> bool:
+    remaining = remaining_time(state)
+    return is_cancelled() or (remaining is not None and remaining <= 0)
+
+
+def check_deadline(state: Dict[str, Any]):
+    if is_cancelled():
+        raise DeadlineExceeded("Request cancelled: client disconnected")
+    remaining = remaining_time(state)
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def run_with_cancellation(event: threading.Event, fn: Callable, *args, **kwargs):
+    """Runs fn with event as the cancellation signal seen by should_stop()/check_deadline()"""
+    token = _cancel_event.set(event)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _cancel_event.reset(token)
+
+
+def guard_deadline(fn: Callable) -> Callable:
+    """Wraps a graph node so it does not start once the request is out of time"""
+    @functools.wraps(fn)
+    def wrapper(state):
+        check_deadline(state)
+        return fn(state)
+    return wrapper
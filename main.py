@@ -1,8 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
+import functools
+import random
+import threading
+import time
+import uuid
 
-from orchestration_agent import build_graph
+from orchestration_agent import (
+    build_graph, build_checkpointer, run_graph, admission_intent,
+    RequestIdConflict, start_checkpoint_pruning, stop_checkpoint_pruning
+)
+from stats import people_stats, start_reconciliation, stop_reconciliation
+from similarity import load_people_indexes
+from sessions import session_store, is_followup_reference
+from scheduler import scheduler, SchedulerFull
+from cache import result_cache, current_data_version, etag_matches
+from profiling import RequestProfile
+from partitions import partition_manager
+from database import read_router
+from analytics import analytics_snapshot, start_snapshot_refresh, stop_snapshot_refresh
+from deadlines import DeadlineExceeded, new_deadline, remaining_time, run_with_cancellation
+from constants import PROFILE_SAMPLE_RATE, REQUEST_DEADLINE_SECONDS, MAX_REQUEST_DEADLINE_SECONDS, DISCONNECT_POLL_SECONDS
 
 app = FastAPI(
     title="LangGraph Multi-Agent Query System",
@@ -10,21 +31,34 @@ app = FastAPI(
     version="1.0.0"
 )
 
-graph = build_graph()
+graph = build_graph(checkpointer=build_checkpointer())
+# Runs nobody can resume (no client-supplied id, not HYBRID) skip the
+# per-step checkpoint writes
+uncheckpointed_graph = build_graph()
 
 class QueryRequest(BaseModel):
     query: str
+    # Retrying with the same id resumes a failed run from its last completed step
+    request_id: Optional[str] = None
+    # Follow-ups ("add the top 3 of those") resolve against this session's prior results
+    session_id: Optional[str] = None
+    # Time budget for the whole request; defaults to REQUEST_DEADLINE_SECONDS
+    timeout_seconds: Optional[float] = None
 
     class Config:
         json_schema_extra = {
             "example": {
-                "query": "Show me all people in the database"
+                "query": "Show me all people in the database",
+                "request_id": "3f2b8c1e-7d4a-4c55-9a57-0e6f4b1d2c9a",
+                "session_id": "analyst-42"
             }
         }
 
 
 class QueryResponse(BaseModel):
     query: str
+    request_id: Optional[str]
+    session_id: Optional[str]
     intent: Optional[str]
     agent: Optional[str]
     response: Optional[dict]
@@ -39,80 +73,301 @@ def health_check():
         "graph_compiled": graph is not None
     }
 
+@app.on_event("startup")
+def on_startup():
+    read_router.start_monitoring()
+    start_reconciliation()
+    load_people_indexes()
+    partition_manager.refresh()
+    start_snapshot_refresh()
+    start_checkpoint_pruning()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_reconciliation()
+    read_router.stop_monitoring()
+    stop_snapshot_refresh()
+    stop_checkpoint_pruning()
+
+
+@app.get("/stats")
+def get_stats():
+    """Summary statistics served from incrementally maintained counters"""
+    return people_stats.summary()
+
+@app.get("/scheduler")
+def get_scheduler_metrics():
+    """Queue depth, concurrency and admission counters per intent"""
+    return scheduler.metrics()
+
+@app.get("/cache")
+def get_cache_metrics():
+    """Read-only LOCAL result cache counters and current data version"""
+    return result_cache.metrics()
+
+@app.get("/partitions")
+def get_partitions():
+    """Location partitions of the people table"""
+    return partition_manager.metrics()
+
+@app.get("/replicas")
+def get_replicas():
+    """Read replica health, replay lag and the last write position"""
+    return read_router.metrics()
+
+@app.get("/analytics")
+def get_analytics():
+    """Columnar snapshot size, staleness and queries served per backend"""
+    return analytics_snapshot.metrics()
+
+def resolve_request_id(request: QueryRequest, idempotency_key: Optional[str]) -> str:
+    return request.request_id or idempotency_key or str(uuid.uuid4())
+
+def should_checkpoint(request: QueryRequest, idempotency_key: Optional[str], state: dict) -> bool:
+    return bool(request.request_id or idempotency_key) or admission_intent(state) == "HYBRID"
+
+def build_initial_state(query: str, session_id: Optional[str], timeout_seconds: Optional[float] = None) -> dict:
+    session = session_store.get(session_id) if session_id else None
+    budget = min(timeout_seconds or REQUEST_DEADLINE_SECONDS, MAX_REQUEST_DEADLINE_SECONDS)
+    return {
+        "deadline": new_deadline(budget),
+        "query": query,
+        "intent": None,
+        "local_result": None,
+        "external_result": None,
+        "final_response": None,
+        "error": None,
+        "session_external_result": session.get("external_result") if session else None,
+        "session_local_result": session.get("local_result") if session else None,
+        "min_read_lsn": session.get("read_lsn") if session else None
+    }
+
+def remember_session(session_id: Optional[str], query: str, result: dict):
+    if session_id:
+        session_store.update(
+            session_id,
+            query,
+            external_result=result.get("external_result"),
+            local_result=result.get("local_result"),
+            read_lsn=result.get("min_read_lsn")
+        )
+
+def resumable_error(error_msg: str, request_id: str, resumable: bool = True) -> HTTPException:
+    if not resumable:
+        return HTTPException(status_code=500, detail=error_msg)
+    return HTTPException(
+        status_code=500,
+        detail={
+            "error": error_msg,
+            "request_id": request_id,
+            "resumable": True,
+            "message": "Retry with the same request_id to resume from the failed step"
+        }
+    )
+
+async def run_scheduled(
+    state: dict,
+    request_id: str,
+    profile: RequestProfile = None,
+    http_request: Request = None,
+    checkpointed: bool = True
+) -> dict:
+    """
+    Runs the graph once the intent's scheduler queue admits the request
+
+    Admission uses a keyword pre-classification, since the LLM intent is
+    only known inside the graph. Full queues are rejected with 429. While
+    the graph runs, the client connection is polled and a disconnect
+    cancels the remaining work; running out of budget returns 504.
+    Only checkpointed runs are tied to request_id (and resumable).
+    """
+    intent = admission_intent(state)
+    cancel_event = threading.Event()
+    try:
+        queued_at = time.perf_counter()
+        async with scheduler.slot(intent, timeout=remaining_time(state)):
+            if checkpointed:
+                call = functools.partial(run_graph, graph, state, request_id)
+            else:
+                call = functools.partial(uncheckpointed_graph.invoke, state)
+            if profile is not None:
+                profile.add_span("queue_wait", queued_at, time.perf_counter())
+                call = functools.partial(profile.run, call)
+
+            task = asyncio.ensure_future(
+                run_in_threadpool(run_with_cancellation, cancel_event, call)
+            )
+            while not task.done():
+                await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+                if task.done() or cancel_event.is_set() or http_request is None:
+                    continue
+                if await http_request.is_disconnected():
+                    print(f"Client disconnected, cancelling request {request_id}")
+                    cancel_event.set()
+            result = task.result()
+            scheduler.record_classification(intent, result.get("intent"))
+            return result
+    except SchedulerFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many pending {e.intent} requests, retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except RequestIdConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DeadlineExceeded as e:
+        if not checkpointed:
+            raise HTTPException(status_code=504, detail=str(e))
+        raise HTTPException(
+            status_code=504,
+            detail={
+                "error": str(e),
+                "request_id": request_id,
+                "resumable": True,
+                "message": "Retry with the same request_id to resume from the last completed step"
+            }
+        )
+
 @app.post("/query")
-def process_query(request: QueryRequest):
+async def process_query(
+    request: QueryRequest,
+    response: Response,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None)
+):
     
     query = request.query.strip()
     
     if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    request_id = resolve_request_id(request, idempotency_key)
+
+    # Read-only LOCAL results are served from cache while the data version
+    # is unchanged; follow-ups depend on session state and are never cached
+    cache_key = None if is_followup_reference(query) else result_cache.key(query)
+    cached = result_cache.get(cache_key) if cache_key else None
+    if cached:
+        if etag_matches(if_none_match, cached["etag"]):
+            return Response(status_code=304, headers={"ETag": cached["etag"]})
+
+        payload = cached["payload"]
+        remember_session(request.session_id, query, payload)
+        response.headers["ETag"] = cached["etag"]
+        print(f"CACHE HIT: {query}")
+        return {
+            "query": query,
+            "request_id": request_id,
+            "session_id": request.session_id,
+            "intent": payload["intent"],
+            "response": payload["final_response"],
+            "error": payload["error"]
+        }
     
     print(f"\n{'='*60}")
     print(f"NEW QUERY: {query}")
     print(f"{'='*60}")
-    
+
+    checkpointed = False
     try:
-        state = {
-            "query": query,
-            "intent": None,
-            "local_result": None,
-            "external_result": None,
-            "final_response": None,
-            "error": None
-        }
+        state = build_initial_state(query, request.session_id, request.timeout_seconds)
+        checkpointed = should_checkpoint(request, idempotency_key, state)
+        data_version = current_data_version()
 
-        result = graph.invoke(state)
+        result = await run_scheduled(state, request_id, http_request=http_request, checkpointed=checkpointed)
+        remember_session(request.session_id, query, result)
         
         print(f"QUERY COMPLETED")
         print(f"Intent: {result.get('intent')}")
         print(f"Agent: {result.get('final_response', {}).get('agent', 'Unknown')}")
 
+        if cache_key and result.get("intent") == "LOCAL" and result.get("read_only") and not result.get("partial"):
+            etag = result_cache.put(cache_key, data_version, {
+                "intent": result.get("intent"),
+                "final_response": result.get("final_response"),
+                "local_result": result.get("local_result"),
+                "error": result.get("error")
+            })
+            if etag:
+                response.headers["ETag"] = etag
+
         return {
             "query": query,
+            "request_id": request_id,
+            "session_id": request.session_id,
             "intent": result.get("intent"),
             "response": result.get("final_response"),
             "error": result.get("error")
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Error processing query: {str(e)}"
         print(f"ERROR: {error_msg}")
-        raise HTTPException(status_code=500, detail=error_msg)
+        raise resumable_error(error_msg, request_id, checkpointed)
 
 
 @app.post("/query/detailed")
-def process_query_detailed(request: QueryRequest):
+async def process_query_detailed(
+    request: QueryRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_profile: Optional[str] = Header(default=None),
+    profile: bool = False,
+    profile_format: str = "speedscope"
+):
+    """
+    Full graph state for debugging
+
+    Profiling is opt-in via ?profile=true or an "X-Profile: 1" header, and
+    a PROFILE_SAMPLE_RATE fraction of requests is profiled automatically.
+    profile_format is "speedscope" (JSON for speedscope.app) or "collapsed"
+    (flamegraph.pl / collapsed-stack text).
+    """
 
     query = request.query.strip()
     
     if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    request_id = resolve_request_id(request, idempotency_key)
+    checkpointed = False
     
     try:
-        state = {
-            "query": query,
-            "intent": None,
-            "local_result": None,
-            "external_result": None,
-            "final_response": None,
-            "error": None
-        }
+        state = build_initial_state(query, request.session_id, request.timeout_seconds)
+        checkpointed = should_checkpoint(request, idempotency_key, state)
+
+        profiling = (
+            profile
+            or (x_profile or "").lower() in ("1", "true", "yes")
+            or random.random() < PROFILE_SAMPLE_RATE
+        )
+        request_profile = RequestProfile() if profiling else None
 
-        result = graph.invoke(state)
+        result = await run_scheduled(state, request_id, request_profile, http_request, checkpointed)
+        remember_session(request.session_id, query, result)
 
         return {
             "query": query,
+            "request_id": request_id,
+            "session_id": request.session_id,
             "intent": result.get("intent"),
             "local_result": result.get("local_result"),
             "external_result": result.get("external_result"),
             "final_response": result.get("final_response"),
             "error": result.get("error"),
-            "full_state": result
+            "full_state": result,
+            "profile": request_profile.export(profile_format) if request_profile else None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Error processing query: {str(e)}"
-        raise HTTPException(status_code=500, detail=error_msg)
+        raise resumable_error(error_msg, request_id, checkpointed)
 
 
 if __name__ == "__main__":
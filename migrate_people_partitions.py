@@ -0,0 +1,174 @@
+"""
+Converts the people table into a location-partitioned table
+
+Declares a new table with the same columns plus a location_key column,
+partitioned on it (LIST per location plus a default partition, or HASH),
+copies every row in one pass (filling location_key with
+people_location_key(location)) and swaps the tables inside one
+transaction. The primary key becomes (<old key>, location_key), since a
+unique constraint on a partitioned table must include the partition key.
+Writes to people block while the copy runs; reads continue. The old table
+is kept as people_unpartitioned unless --drop-old is given. Foreign keys
+that reference people cannot follow the swap, so the migration refuses to
+run while any exist. Restart the API afterwards so it picks up the new
+layout; inserts must then supply location_key (the API's writers do).
+
+Usage:
+    python migrate_people_partitions.py --dry-run
+    python migrate_people_partitions.py
+    python migrate_people_partitions.py --scheme hash --partitions 32
+"""
+from typing import List
+from sqlalchemy import text
+import argparse
+import time
+
+from constants import PEOPLE_PARTITION_SCHEME, PEOPLE_HASH_PARTITIONS
+from database import get_engine
+from partitions import (
+    PARENT_TABLE, KEY_COLUMN, KEY_FUNCTION, KEY_FUNCTION_DDL, partition_ddl, partition_name
+)
+
+STAGING_TABLE = "people_partitioned"
+BACKUP_TABLE = "people_unpartitioned"
+
+
+def serial_columns(conn, table: str) -> List[tuple]:
+    """(column, sequence) pairs for columns backed by an owned sequence"""
+    rows = conn.execute(text(
+        "SELECT column_name, pg_get_serial_sequence(:table, column_name) "
+        "FROM information_schema.columns "
+        "WHERE table_name = :table AND table_schema = current_schema()"
+    ), {"table": table}).fetchall()
+    return [(column, sequence) for column, sequence in rows if sequence]
+
+
+def primary_key_columns(conn, table: str) -> List[str]:
+    return conn.execute(text(
+        "SELECT a.attname FROM pg_index i "
+        "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+        "WHERE i.indrelid = to_regclass(:table) AND i.indisprimary"
+    ), {"table": table}).scalars().all()
+
+
+def referencing_foreign_keys(conn, table: str) -> List[tuple]:
+    """(constraint, referencing table) pairs for foreign keys pointing at table"""
+    return conn.execute(text(
+        "SELECT conname, conrelid::regclass::text FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(:table)"
+    ), {"table": table}).fetchall()
+
+
+def migrate(scheme: str, hash_partitions: int, drop_old: bool, dry_run: bool):
+    started = time.perf_counter()
+
+    with get_engine().connect() as conn:
+        trans = conn.begin()
+
+        already = conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+        ), {"table": PARENT_TABLE}).scalar()
+        if already:
+            print(f"MIGRATE {PARENT_TABLE} is already partitioned, nothing to do")
+            trans.rollback()
+            return
+
+        conn.execute(text(KEY_FUNCTION_DDL))
+        conn.execute(text(f"LOCK TABLE {PARENT_TABLE} IN EXCLUSIVE MODE"))
+
+        # They would keep pointing at the renamed old table (and block
+        # dropping it); they have to be dropped first and re-created
+        # against (<key>, location_key) after the swap
+        foreign_keys = referencing_foreign_keys(conn, PARENT_TABLE)
+        if foreign_keys:
+            for constraint, table in foreign_keys:
+                print(f"MIGRATE Foreign key {constraint} on {table} references {PARENT_TABLE}")
+            print("MIGRATE Drop these constraints before partitioning, aborting")
+            trans.rollback()
+            return
+
+        pk_columns = primary_key_columns(conn, PARENT_TABLE)
+        if pk_columns:
+            print(
+                f"MIGRATE Primary key ({', '.join(pk_columns)}) becomes "
+                f"({', '.join(pk_columns + [KEY_COLUMN])})"
+            )
+
+        key_counts = conn.execute(text(
+            f"SELECT {KEY_FUNCTION}(location), COUNT(*) FROM {PARENT_TABLE} GROUP BY 1 ORDER BY 2 DESC"
+        )).fetchall()
+        keys = [key for key, _ in key_counts]
+        total = sum(count for _, count in key_counts)
+
+        print(f"MIGRATE {total} rows across {len(keys)} locations, scheme={scheme}")
+        if scheme == "list":
+            for key, count in key_counts:
+                print(f"MIGRATE   {partition_name(key):<50} {count:>12}")
+        else:
+            print(f"MIGRATE   {hash_partitions} hash partitions")
+
+        if dry_run:
+            trans.rollback()
+            print("MIGRATE Dry run, rolled back")
+            return
+
+        strategy = "HASH" if scheme == "hash" else "LIST"
+        conn.execute(text(
+            f"CREATE TABLE {STAGING_TABLE} "
+            f"(LIKE {PARENT_TABLE} INCLUDING DEFAULTS, {KEY_COLUMN} TEXT NOT NULL) "
+            f"PARTITION BY {strategy} ({KEY_COLUMN})"
+        ))
+        for statement in partition_ddl(scheme, keys, hash_partitions, parent=STAGING_TABLE):
+            conn.execute(text(statement))
+
+        copied = conn.execute(text(
+            f"INSERT INTO {STAGING_TABLE} SELECT *, {KEY_FUNCTION}(location) FROM {PARENT_TABLE}"
+        )).rowcount
+        print(f"MIGRATE Copied {copied} rows")
+
+        # Unique constraints on a partitioned table must contain the
+        # partition key; (id, location_key) is still unique wherever id is
+        if pk_columns:
+            conn.execute(text(
+                f"ALTER TABLE {STAGING_TABLE} ADD PRIMARY KEY ({', '.join(pk_columns + [KEY_COLUMN])})"
+            ))
+
+        # Serves the partition-pruned duplicate check in the hybrid insert path
+        conn.execute(text(f"CREATE INDEX ON {STAGING_TABLE} ({KEY_COLUMN}, LOWER(name))"))
+        conn.execute(text(f"CREATE INDEX ON {STAGING_TABLE} (role)"))
+
+        sequences = serial_columns(conn, PARENT_TABLE)
+
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {BACKUP_TABLE}"))
+        conn.execute(text(f"ALTER TABLE {STAGING_TABLE} RENAME TO {PARENT_TABLE}"))
+
+        # Hand id sequences to the new table so dropping the old one keeps them
+        for column, sequence in sequences:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {PARENT_TABLE}.{column}"))
+
+        if drop_old:
+            conn.execute(text(f"DROP TABLE {BACKUP_TABLE}"))
+
+        trans.commit()
+
+    with get_engine().connect() as conn:
+        conn.execute(text(f"ANALYZE {PARENT_TABLE}"))
+        conn.commit()
+
+    kept = "dropped" if drop_old else f"kept as {BACKUP_TABLE}"
+    print(f"MIGRATE Done in {time.perf_counter() - started:.1f}s; old table {kept}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scheme", choices=["list", "hash"], default=PEOPLE_PARTITION_SCHEME)
+    parser.add_argument("--partitions", type=int, default=PEOPLE_HASH_PARTITIONS, help="hash partition count")
+    parser.add_argument("--drop-old", action="store_true", help=f"drop {BACKUP_TABLE} after the swap")
+    parser.add_argument("--dry-run", action="store_true", help="print the partition plan and roll back")
+    args = parser.parse_args()
+
+    migrate(args.scheme, args.partitions, args.drop_old, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
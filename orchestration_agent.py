@@ -1,9 +1,23 @@
-from typing import TypedDict, Optional, Any, Dict
+from typing import TypedDict, Optional, Any, Dict, List
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.sqlite import SqliteSaver
 from langchain_groq import ChatGroq
+from datetime import datetime, timedelta, timezone
 import os
-from constants import GROQ_API_KEY, POSTGRES_URI
-from agents import local_db_agent, external_search_agent, hybrid_agent
+import re
+import sqlite3
+import threading
+from constants import GROQ_API_KEY, POSTGRES_URI, CHECKPOINT_DB_PATH, CHECKPOINT_TTL_SECONDS, CHECKPOINT_PRUNE_INTERVAL
+from sessions import is_followup_reference
+from profiling import span, traced_node
+from deadlines import guard_deadline, remaining_time
+from agents import (
+    local_db_agent,
+    external_search_agent,
+    hybrid_agent,
+    hybrid_insert_step,
+    hybrid_summary_step
+)
 
 llm = ChatGroq(
     model="llama-3.1-8b-instant",
@@ -17,11 +31,71 @@ class GraphState(TypedDict):
     external_result: Optional[Any]
     final_response: Optional[Any]
     error: Optional[str]
+    inserted_people: Optional[List[Dict[str, Any]]]
+    skipped_people: Optional[List[Dict[str, Any]]]
+    session_external_result: Optional[List[Dict[str, Any]]]
+    session_local_result: Optional[Any]
+    # Set by agents whose response did not modify data and may be cached
+    read_only: Optional[bool]
+    # Wall-clock deadline (epoch seconds) for the whole request
+    deadline: Optional[float]
+    # Set when an agent stopped early at the deadline and returned what it had
+    partial: Optional[bool]
+    # WAL position a replica must have replayed to serve this request's reads
+    # (read-your-writes across the request and its session)
+    min_read_lsn: Optional[int]
+
+
+def classify_session_followup(state: GraphState) -> Optional[str]:
+    """
+    Resolves follow-ups such as "add the top 3 of those" without an LLM call
+
+    Only applies when the session already holds prior results; add/save
+    references to external candidates go to HYBRID, anything else re-shows
+    the most relevant prior result set.
+    """
+    query = state["query"]
+    has_external = bool(state.get("session_external_result"))
+    has_local = bool(state.get("session_local_result"))
+    if not (has_external or has_local) or not is_followup_reference(query):
+        return None
+
+    if has_external and any(word in query.lower() for word in ["add", "save", "insert"]):
+        return "HYBRID"
+    return "EXTERNAL" if has_external else "LOCAL"
+
+
+SEARCH_KEYWORDS = re.compile(r"\b(?:find|search|look up|discover|get me)\b")
+# "... and add top 5", "... and save them": a search followed by a write
+SAVE_AFTER_SEARCH = re.compile(r"\band (?:then )?(?:add|save|insert|store)\b")
+
+
+def keyword_intent(query: str) -> str:
+    """Cheap keyword-based intent, used as LLM fallback and for admission control"""
+    query_lower = query.lower()
+    searches = bool(SEARCH_KEYWORDS.search(query_lower))
+
+    if SAVE_AFTER_SEARCH.search(query_lower) or \
+       (searches and any(word in query_lower for word in ["add", "save", "insert"])):
+        return "HYBRID"
+    if searches:
+        return "EXTERNAL"
+    return "LOCAL"
+
+
+def admission_intent(state: GraphState) -> str:
+    """Best pre-graph guess of the intent, so requests can be scheduled by cost"""
+    return classify_session_followup(state) or keyword_intent(state["query"])
 
 
 def intent_classifier(state: GraphState) -> Dict[str, Any]:
 
     query = state["query"]
+
+    followup_intent = classify_session_followup(state)
+    if followup_intent:
+        print(f"ORCHESTRATOR Session follow-up detected → {followup_intent}")
+        return {"intent": followup_intent}
     
     # Comprehensive prompt for intent classification
     classification_prompt = f"""You are an intelligent intent classification system for a multi-agent recruitment database application.
@@ -130,7 +204,12 @@ HYBRID"""
         print(f"ORCHESTRATOR {'='*60}")
         
         # Get LLM classification
-        response = llm.invoke(classification_prompt)
+        timeout = remaining_time(state)
+        with span("llm.invoke"):
+            if timeout is None:
+                response = llm.invoke(classification_prompt)
+            else:
+                response = llm.invoke(classification_prompt, timeout=timeout)
         # intent = response.content.strip().upper()
         intent = (
             response.content.strip().upper()
@@ -153,18 +232,8 @@ HYBRID"""
             print(f"ORCHESTRATOR  Invalid intent '{intent}', applying fallback logic...")
             
             # Fallback logic based on keywords
-            query_lower = query.lower()
-            
-            if any(word in query_lower for word in ["add", "save", "insert"]) and \
-               any(word in query_lower for word in ["find", "search", "look up"]):
-                intent = "HYBRID"
-                print(f"ORCHESTRATOR Fallback: Detected search + add keywords → HYBRID")
-            elif any(word in query_lower for word in ["find", "search", "look up", "discover"]):
-                intent = "EXTERNAL"
-                print(f"ORCHESTRATOR Fallback: Detected search keywords → EXTERNAL")
-            else:
-                intent = "LOCAL"
-                print(f"ORCHESTRATOR Fallback: Default to LOCAL")
+            intent = keyword_intent(query)
+            print(f"ORCHESTRATOR Fallback: Keyword match → {intent}")
         
         # Log the decision
         print(f"ORCHESTRATOR ✓ Intent Classified: {intent}")
@@ -231,24 +300,169 @@ def error_handler(state: GraphState) -> Dict[str, Any]:
         }
     }
 
-def build_graph():    
+def route_hybrid_search(state: GraphState) -> str:
+    """Ends the hybrid pipeline early when candidate generation found nothing"""
+    if state.get("final_response"):
+        return END
+    return "hybrid_insert_step"
+
+def build_checkpointer() -> SqliteSaver:
+    """Local SQLite checkpointer so completed graph steps survive failures"""
+    return SqliteSaver.from_conn_string(CHECKPOINT_DB_PATH)
+
+_checkpoint_prune_thread: Optional[threading.Thread] = None
+_checkpoint_prune_stop = threading.Event()
+
+
+def prune_checkpoints(path: str = CHECKPOINT_DB_PATH, ttl_seconds: float = CHECKPOINT_TTL_SECONDS) -> int:
+    """Deletes every checkpoint of threads (request ids) idle for longer than ttl_seconds"""
+    if path == ":memory:":
+        return 0
+
+    # thread_ts is an ISO-8601 UTC timestamp, so string comparison orders it
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=ttl_seconds)).isoformat()
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'checkpoints'"
+        ).fetchone():
+            return 0
+        deleted = conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id IN ("
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(thread_ts) < ?)",
+            (cutoff,)
+        ).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+
+    if deleted:
+        print(f"ORCHESTRATOR Pruned {deleted} expired checkpoints")
+    return deleted
+
+
+def _checkpoint_prune_loop(interval: float):
+    while True:
+        try:
+            prune_checkpoints()
+        except Exception as e:
+            print(f"ORCHESTRATOR Checkpoint pruning failed: {e}")
+        if _checkpoint_prune_stop.wait(interval):
+            return
+
+
+def start_checkpoint_pruning(interval: float = CHECKPOINT_PRUNE_INTERVAL):
+    """Starts the periodic checkpoint TTL cleanup (no-op if disabled or already running)"""
+    global _checkpoint_prune_thread
+
+    if interval <= 0 or (_checkpoint_prune_thread and _checkpoint_prune_thread.is_alive()):
+        return
+
+    _checkpoint_prune_stop.clear()
+    _checkpoint_prune_thread = threading.Thread(
+        target=_checkpoint_prune_loop,
+        args=(interval,),
+        name="checkpoint-prune",
+        daemon=True
+    )
+    _checkpoint_prune_thread.start()
+
+
+def stop_checkpoint_pruning():
+    _checkpoint_prune_stop.set()
+
+
+class RequestIdConflict(Exception):
+    """A request id was reused for a different query"""
+
+
+def run_failed(values: Dict[str, Any]) -> bool:
+    final_response = values.get("final_response") or {}
+    return bool(
+        values.get("error")
+        or final_response.get("agent") == "ERROR_HANDLER"
+        or final_response.get("error")
+    )
+
+
+_running_requests = set()
+_running_lock = threading.Lock()
+
+
+def run_graph(graph, state: Dict[str, Any], request_id: str) -> Dict[str, Any]:
+    """
+    Runs the graph under a request (idempotency) id
+
+    A run that previously failed mid-way is resumed from its last
+    checkpointed step, and a run that completed successfully for the same
+    query returns its stored state instead of executing again. A run that
+    ended in an error response is started afresh. Reusing a request id for
+    a different query, or while a run under it is still in progress in this
+    process, raises RequestIdConflict.
+    """
+    with _running_lock:
+        if request_id in _running_requests:
+            raise RequestIdConflict(f"Request id {request_id} is already running")
+        _running_requests.add(request_id)
+
+    try:
+        return _resume_or_run(graph, state, request_id)
+    finally:
+        with _running_lock:
+            _running_requests.discard(request_id)
+
+
+def _resume_or_run(graph, state: Dict[str, Any], request_id: str) -> Dict[str, Any]:
+    config = {"configurable": {"thread_id": request_id}}
+    snapshot = graph.get_state(config)
+
+    if snapshot and snapshot.values:
+        if snapshot.values.get("query") != state["query"]:
+            raise RequestIdConflict(f"Request id {request_id} was already used for a different query")
+
+        if snapshot.next:
+            print(f"ORCHESTRATOR Resuming request {request_id} at: {', '.join(snapshot.next)}")
+            # The checkpointed deadline belongs to the failed attempt
+            graph.update_state(config, {"deadline": state.get("deadline")})
+            return graph.invoke(None, config)
+
+        if snapshot.values.get("final_response") and not run_failed(snapshot.values):
+            print(f"ORCHESTRATOR Request {request_id} already completed, returning stored result")
+            return snapshot.values
+
+        print(f"ORCHESTRATOR Request {request_id} previously failed, starting a fresh run")
+
+    # Every key is set so nothing from an earlier run on this thread carries over
+    fresh_state = {key: None for key in GraphState.__annotations__}
+    fresh_state.update(state)
+    return graph.invoke(fresh_state, config)
+
+def build_graph(checkpointer=None):    
     
     workflow = StateGraph(GraphState)
     print("ORCHESTRATOR Adding nodes:")
     
-    workflow.add_node("intent_classifier", intent_classifier)
+    workflow.add_node("intent_classifier", traced_node("intent_classifier", guard_deadline(intent_classifier)))
     print("ORCHESTRATOR intent_classifier - Orchestration & routing")
     
-    workflow.add_node("local_db_agent", local_db_agent)
+    workflow.add_node("local_db_agent", traced_node("local_db_agent", guard_deadline(local_db_agent)))
     print("ORCHESTRATOR local_db_agent - Database operations")
     
-    workflow.add_node("external_search_agent", external_search_agent)
+    workflow.add_node("external_search_agent", traced_node("external_search_agent", guard_deadline(external_search_agent)))
     print("ORCHESTRATOR external_search_agent - External candidate search")
     
-    workflow.add_node("hybrid_agent", hybrid_agent)
+    workflow.add_node("hybrid_agent", traced_node("hybrid_agent", guard_deadline(hybrid_agent)))
     print("ORCHESTRATOR hybrid_agent - Search + Database insert")
+
+    # The insert step checks the deadline between inserts and marks its
+    # result partial, and the summary step and error handler are cheap and
+    # always run, so a request stopped at its deadline still returns the
+    # candidates generated so far
+    workflow.add_node("hybrid_insert_step", traced_node("hybrid_insert_step", hybrid_insert_step))
+    workflow.add_node("hybrid_summary_step", traced_node("hybrid_summary_step", hybrid_summary_step))
+    print("ORCHESTRATOR hybrid_insert_step, hybrid_summary_step - Checkpointed hybrid steps")
     
-    workflow.add_node("error_handler", error_handler)
+    workflow.add_node("error_handler", traced_node("error_handler", error_handler))
     print("ORCHESTRATOR error_handler - Error management")
 
     # Set entry point - always start with intent classification
@@ -272,7 +486,16 @@ def build_graph():
     # All agents terminate the workflow (no further processing)
     workflow.add_edge("local_db_agent", END)
     workflow.add_edge("external_search_agent", END)
-    workflow.add_edge("hybrid_agent", END)
+    workflow.add_conditional_edges(
+        "hybrid_agent",
+        route_hybrid_search,
+        {
+            "hybrid_insert_step": "hybrid_insert_step",
+            END: END
+        }
+    )
+    workflow.add_edge("hybrid_insert_step", "hybrid_summary_step")
+    workflow.add_edge("hybrid_summary_step", END)
     workflow.add_edge("error_handler", END)
     print("ORCHESTRATOR Terminal nodes configured")
     
@@ -286,7 +509,7 @@ def build_graph():
     print("ORCHESTRATOR   • Error Handler: Graceful error management")
     
     # Compile and return the graph
-    compiled_graph = workflow.compile()
+    compiled_graph = workflow.compile(checkpointer=checkpointer)
     print("ORCHESTRATOR Graph compiled and ready for execution!\n")
 
     return compiled_graph
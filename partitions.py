@@ -0,0 +1,195 @@
+from typing import Dict, Any, Iterable, List, Optional, Set
+from sqlalchemy import text
+import hashlib
+import re
+import threading
+
+from constants import PEOPLE_PARTITION_SCHEME, PEOPLE_HASH_PARTITIONS
+from database import get_engine
+
+PARENT_TABLE = "people"
+DEFAULT_PARTITION = "people_default"
+UNKNOWN_LOCATION = "unknown"
+KEY_COLUMN = "location_key"
+KEY_FUNCTION = "people_location_key"
+
+def location_key_sql(column: str = "location") -> str:
+    """
+    SQL twin of location_key() over column
+
+    Both must normalize identically so that keys written from Python and
+    keys computed in SQL (migration, unpartitioned aggregates) agree.
+    """
+    return (
+        f"COALESCE(NULLIF(BTRIM(LOWER(REGEXP_REPLACE(COALESCE({column}, ''), "
+        f"'[^A-Za-z0-9]+', '_', 'g')), '_'), ''), '{UNKNOWN_LOCATION}')"
+    )
+
+
+# Fills KEY_COLUMN when existing rows are migrated
+KEY_FUNCTION_DDL = f"""
+CREATE OR REPLACE FUNCTION {KEY_FUNCTION}(location TEXT) RETURNS TEXT
+LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+    SELECT {location_key_sql()}
+$$
+"""
+
+
+def location_key(location: Optional[str]) -> str:
+    """Normalized partition key: "New  Delhi" and "new-delhi" both map to new_delhi"""
+    key = re.sub(r"[^A-Za-z0-9]+", "_", location or "").lower().strip("_")
+    return key or UNKNOWN_LOCATION
+
+
+def partition_name(key: str) -> str:
+    name = f"people_p_{key}"
+    if len(name) <= 63:
+        return name
+    # Postgres truncates identifiers at 63 bytes; keep long keys distinct
+    digest = hashlib.md5(key.encode()).hexdigest()[:8]
+    return f"people_p_{key[:44]}_{digest}"
+
+
+class PartitionManager:
+    """
+    Tracks the location partitions of people and creates missing ones
+
+    people is partitioned on its location_key column: by LIST with one
+    partition per location plus a default partition, or by HASH into a
+    fixed number of partitions. The column is a plain NOT NULL column (so
+    the primary key can include it), and writers fill it from
+    location_key() via key_values(). With the list scheme, writers also call
+    ensure() before inserting so each new location gets its own partition;
+    rows that already landed in the default partition are moved into it.
+    If people is not (yet) partitioned, everything here is a no-op,
+    key_values() is empty and location_predicate() returns no filter.
+    """
+
+    def __init__(self, scheme: str = PEOPLE_PARTITION_SCHEME):
+        self.scheme = scheme
+        self._lock = threading.Lock()
+        self._known: Set[str] = set()
+        self._partitioned: Optional[bool] = None
+
+    @property
+    def enabled(self) -> bool:
+        if self._partitioned is None:
+            self.refresh()
+        return bool(self._partitioned)
+
+    def refresh(self) -> bool:
+        """Reloads the partition list from the catalog"""
+        try:
+            with get_engine().connect() as conn:
+                strategy = conn.execute(text(
+                    "SELECT partstrat FROM pg_partitioned_table "
+                    "WHERE partrelid = to_regclass(:parent)"
+                ), {"parent": PARENT_TABLE}).scalar()
+                children = conn.execute(text(
+                    "SELECT c.relname FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = to_regclass(:parent)"
+                ), {"parent": PARENT_TABLE}).scalars().all()
+        except Exception as e:
+            print(f"PARTITIONS Catalog lookup failed: {e}")
+            return False
+
+        with self._lock:
+            self._partitioned = strategy is not None
+            if strategy is not None:
+                self.scheme = "hash" if strategy == "h" else "list"
+            self._known = set(children)
+
+        if strategy is not None:
+            print(f"PARTITIONS {PARENT_TABLE} is {self.scheme}-partitioned ({len(children)} partitions)")
+        return True
+
+    def location_predicate(self, location: Optional[str]) -> Optional[str]:
+        """
+        WHERE-clause fragment that lets the planner prune to one partition
+
+        The key is restricted to [a-z0-9_], so it is safe to inline.
+        """
+        if not location or not self.enabled:
+            return None
+        return f"{KEY_COLUMN} = '{location_key(location)}'"
+
+    def key_sql(self) -> str:
+        """SQL for a row's location key: the key column, or the normalization itself"""
+        return KEY_COLUMN if self.enabled else location_key_sql()
+
+    def key_values(self, location: Optional[str]) -> Dict[str, str]:
+        """Partition key column value(s) a people insert must carry"""
+        if not self.enabled:
+            return {}
+        return {KEY_COLUMN: location_key(location)}
+
+    def ensure(self, locations: Iterable[Optional[str]]):
+        """Creates list partitions for any locations that do not have one yet"""
+        if not self.enabled or self.scheme != "list":
+            return
+
+        keys = {location_key(location) for location in locations}
+        missing = {key for key in keys if partition_name(key) not in self._known}
+        for key in sorted(missing):
+            try:
+                self._create_list_partition(key)
+            except Exception as e:
+                # The row still lands in the default partition
+                print(f"PARTITIONS Could not create partition for '{key}': {e}")
+
+    def _create_list_partition(self, key: str):
+        name = partition_name(key)
+
+        # Own short transaction: attaching locks the parent briefly, which
+        # must not be held for the duration of a write batch
+        with get_engine().begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name})
+            exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+
+            if not exists:
+                conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+                moved = conn.execute(text(
+                    f"WITH moved AS ("
+                    f"DELETE FROM {DEFAULT_PARTITION} WHERE {KEY_COLUMN} = :key RETURNING *"
+                    f") INSERT INTO {name} SELECT * FROM moved"
+                ), {"key": key}).rowcount
+                conn.execute(text(
+                    f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES IN ('{key}')"
+                ))
+                print(f"PARTITIONS Created {name} (moved {moved} rows from {DEFAULT_PARTITION})")
+
+        with self._lock:
+            self._known.add(name)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "partitioned": self.enabled,
+            "scheme": self.scheme,
+            "partitions": sorted(self._known)
+        }
+
+
+def partition_ddl(
+    scheme: str,
+    keys: List[str],
+    hash_partitions: int = PEOPLE_HASH_PARTITIONS,
+    parent: str = PARENT_TABLE
+) -> List[str]:
+    """Statements that create the partitions of a freshly declared people table"""
+    if scheme == "hash":
+        return [
+            f"CREATE TABLE people_h{i} PARTITION OF {parent} "
+            f"FOR VALUES WITH (MODULUS {hash_partitions}, REMAINDER {i})"
+            for i in range(hash_partitions)
+        ]
+
+    statements = [f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {parent} DEFAULT"]
+    statements += [
+        f"CREATE TABLE {partition_name(key)} PARTITION OF {parent} FOR VALUES IN ('{key}')"
+        for key in keys
+    ]
+    return statements
+
+
+partition_manager = PartitionManager()
@@ -0,0 +1,187 @@
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import os
+import sys
+import threading
+import time
+
+from constants import PROFILE_SAMPLE_INTERVAL_MS
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Sampling profile plus span timeline for a single request
+
+    Spans (graph nodes, LLM calls, parsing) are recorded explicitly; a
+    background thread samples the Python stacks of every thread that has
+    entered a span for this request, prefixing each stack with the span it
+    was in. Results export as speedscope JSON or collapsed stacks.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.samples: Counter = Counter()
+        self._active: Dict[int, List[str]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def _ms(self, t: float) -> float:
+        return round((t - self.started) * 1000, 3)
+
+    def add_span(self, name: str, start: float, end: float, thread_id: int = None):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start_ms": self._ms(start),
+                "duration_ms": round((end - start) * 1000, 3),
+                "thread": thread_id or threading.get_ident()
+            })
+
+    @contextmanager
+    def span(self, name: str):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active.setdefault(thread_id, []).append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._active[thread_id].pop()
+            self.add_span(name, start, end, thread_id)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Runs fn in the calling thread with this profile active and sampling"""
+        token = _current_profile.set(self)
+        self._start_sampling()
+        try:
+            with self.span("request"):
+                return fn(*args, **kwargs)
+        finally:
+            self._stop.set()
+            self.finished = time.perf_counter()
+            _current_profile.reset(token)
+
+    def _start_sampling(self):
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                active = {tid: list(names) for tid, names in self._active.items() if names}
+
+            for thread_id, span_names in active.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[tuple([f"span:{name}" for name in span_names] + stack)] += 1
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        return sorted(self.spans, key=lambda s: s["start_ms"])
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format, one "frame;frame;... count" per line"""
+        return "\n".join(
+            f"{';'.join(stack)} {count}"
+            for stack, count in self.samples.most_common()
+        )
+
+    def speedscope(self) -> Dict[str, Any]:
+        frames: List[Dict[str, str]] = []
+        frame_index: Dict[str, int] = {}
+
+        def index_of(name: str) -> int:
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                frames.append({"name": name})
+            return frame_index[name]
+
+        end_ms = self._ms(self.finished or time.perf_counter())
+        interval_ms = self.interval * 1000
+
+        stacks: List[Tuple[List[int], float]] = [
+            ([index_of(name) for name in stack], count * interval_ms)
+            for stack, count in self.samples.most_common()
+        ]
+
+        # Opens sort outer-first and closes inner-first at equal timestamps,
+        # keeping the evented profile properly nested
+        events = []
+        for span in self.spans:
+            frame = index_of(f"span:{span['name']}")
+            open_at = span["start_ms"]
+            close_at = open_at + max(span["duration_ms"], 0.001)
+            events.append(((open_at, 1, -close_at), {"type": "O", "frame": frame, "at": open_at}))
+            events.append(((close_at, 0, -open_at), {"type": "C", "frame": frame, "at": close_at}))
+        events.sort(key=lambda e: e[0])
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": "query profile",
+            "exporter": "multi-agent-system",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "evented",
+                    "name": "spans",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": end_ms,
+                    "events": [event for _, event in events]
+                },
+                {
+                    "type": "sampled",
+                    "name": "samples",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": end_ms,
+                    "samples": [stack for stack, _ in stacks],
+                    "weights": [weight for _, weight in stacks]
+                }
+            ]
+        }
+
+    def export(self, fmt: str = "speedscope") -> Dict[str, Any]:
+        return {
+            "format": fmt,
+            "duration_ms": self._ms(self.finished or time.perf_counter()),
+            "timeline": self.timeline(),
+            "profile": self.collapsed() if fmt == "collapsed" else self.speedscope()
+        }
+
+
+@contextmanager
+def span(name: str):
+    """Records a span on the active request profile; no-op when not profiling"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.span(name):
+        yield
+
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """Wraps a graph node so it shows up as a span when profiling"""
+    @functools.wraps(fn)
+    def wrapper(state):
+        with span(name):
+            return fn(state)
+    return wrapper
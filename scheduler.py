@@ -0,0 +1,184 @@
+from typing import Dict, Any, Optional
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+
+from constants import INTENT_LIMITS, SCHEDULER_MAX_CONCURRENCY, SCHEDULER_QUEUE_TIMEOUT
+
+DEFAULT_INTENT = "LOCAL"
+
+
+class SchedulerFull(Exception):
+    """Raised when an intent queue is full (or the wait timed out)"""
+
+    def __init__(self, intent: str, retry_after: int):
+        super().__init__(f"{intent} queue is full")
+        self.intent = intent
+        self.retry_after = retry_after
+
+
+class IntentQueue:
+    def __init__(self, intent: str, max_concurrency: int, max_queue: int, weight: float):
+        self.intent = intent
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.weight = weight
+        self.waiters: deque = deque()
+        self.running = 0
+        self.virtual_time = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_service_seconds: Optional[float] = None
+
+    def record_service_time(self, seconds: float):
+        if self.avg_service_seconds is None:
+            self.avg_service_seconds = seconds
+        else:
+            self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * seconds
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.waiters),
+            "running": self.running,
+            "max_queue": self.max_queue,
+            "max_concurrency": self.max_concurrency,
+            "weight": self.weight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_service_seconds": self.avg_service_seconds
+        }
+
+
+class IntentScheduler:
+    """
+    Admission control and weighted fair scheduling in front of the graph
+
+    Each intent gets its own bounded queue and concurrency limit, and all
+    intents share a global limit. When a slot frees up, the next request is
+    taken from the eligible queue with the lowest virtual time (advanced by
+    1/weight per dispatch), so cheap LOCAL requests are not starved behind
+    expensive HYBRID ones. Waiting happens on the event loop, so queued
+    requests do not hold threadpool workers.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Dict[str, Any]] = INTENT_LIMITS,
+        max_concurrency: int = SCHEDULER_MAX_CONCURRENCY,
+        queue_timeout: float = SCHEDULER_QUEUE_TIMEOUT
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.classifications: Counter = Counter()
+        self.queues = {
+            intent: IntentQueue(intent, **config)
+            for intent, config in limits.items()
+        }
+
+    def _queue_for(self, intent: str) -> IntentQueue:
+        return self.queues.get(intent) or self.queues[DEFAULT_INTENT]
+
+    def _retry_after(self, queue: IntentQueue) -> int:
+        service = queue.avg_service_seconds or 1.0
+        backlog = len(queue.waiters) + queue.running
+        return max(1, math.ceil(service * backlog / max(queue.max_concurrency, 1)))
+
+    def _dispatch(self):
+        while self.running < self.max_concurrency:
+            eligible = [
+                q for q in self.queues.values()
+                if q.waiters and q.running < q.max_concurrency
+            ]
+            if not eligible:
+                return
+
+            queue = min(eligible, key=lambda q: q.virtual_time)
+            waiter = queue.waiters.popleft()
+            if waiter.done():
+                continue
+
+            queue.running += 1
+            queue.admitted += 1
+            queue.virtual_time += 1.0 / queue.weight
+            self.running += 1
+            waiter.set_result(True)
+
+    def _release(self, queue: IntentQueue, started: Optional[float] = None):
+        queue.running -= 1
+        self.running -= 1
+        if started is not None:
+            queue.record_service_time(time.monotonic() - started)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, intent: str, timeout: Optional[float] = None):
+        """Waits for a slot for at most timeout (capped at queue_timeout) seconds"""
+        queue = self._queue_for(intent)
+        wait_timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+
+        if len(queue.waiters) >= queue.max_queue:
+            queue.rejected += 1
+            raise SchedulerFull(queue.intent, self._retry_after(queue))
+
+        # A queue coming back from idle starts at the current virtual time,
+        # so it cannot claim the share it "missed" while empty
+        if not queue.waiters and queue.running == 0:
+            active = [q.virtual_time for q in self.queues.values() if q.waiters or q.running]
+            if active:
+                queue.virtual_time = max(queue.virtual_time, min(active))
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.waiters.append(waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait({waiter}, timeout=wait_timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(queue)
+            else:
+                waiter.cancel()
+                queue.waiters.remove(waiter)
+            raise
+
+        if not waiter.done():
+            waiter.cancel()
+            queue.waiters.remove(waiter)
+            queue.timed_out += 1
+            raise SchedulerFull(queue.intent, self._retry_after(queue))
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(queue, started)
+
+    def record_classification(self, admitted: str, classified: Optional[str]):
+        """Counts admitted vs. graph-classified intent, so misadmissions show up in metrics"""
+        self.classifications[(admitted, classified or "UNKNOWN")] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "classifications": {
+                f"{admitted}->{classified}": count
+                for (admitted, classified), count in sorted(self.classifications.items())
+            },
+            "misadmitted": sum(
+                count for (admitted, classified), count in self.classifications.items()
+                if admitted != classified
+            ),
+            "queues": {
+                intent: queue.metrics()
+                for intent, queue in self.queues.items()
+            }
+        }
+
+
+scheduler = IntentScheduler()
@@ -0,0 +1,116 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+import threading
+import time
+import re
+
+from constants import SESSION_TTL_SECONDS, SESSION_MAX_ENTRIES
+
+# "those", "them", "the above" etc. point back at the previous result set
+FOLLOWUP_PATTERN = re.compile(
+    r"\b(those|these|them|the above|previous (?:results|candidates)|earlier (?:results|candidates))\b",
+    re.IGNORECASE
+)
+
+
+# A query that searches for something is a new request even if it says "them"
+SEARCH_PATTERN = re.compile(r"\b(find|search|look up|discover|get me)\b", re.IGNORECASE)
+
+# Words a pure follow-up may contain besides the reference itself; anything
+# else (a role, a location, ...) is new content for the classifier
+FOLLOWUP_FILLER = {
+    "add", "save", "insert", "store", "put", "keep", "show", "list", "display",
+    "give", "me", "again", "top", "first", "best", "all", "only", "just", "of",
+    "the", "to", "into", "in", "from", "our", "my", "database", "db", "please",
+    "and", "a", "an", "one", "ones", "can", "you", "now", "then", "people",
+    "candidates", "results", "records", "them", "those", "these", "above",
+    "team",
+}
+
+
+def is_followup_reference(query: str) -> bool:
+    """True only for queries that refer back to prior results and add nothing new"""
+    query = query or ""
+    if not FOLLOWUP_PATTERN.search(query) or SEARCH_PATTERN.search(query):
+        return False
+    remainder = FOLLOWUP_PATTERN.sub(" ", query).lower()
+    return all(word in FOLLOWUP_FILLER for word in re.findall(r"[a-z]+", remainder))
+
+
+class SessionStore:
+    """
+    Bounded store of per-session results, evicted after TTL of inactivity
+
+    Keeps the last external_result/local_result of each conversation so a
+    follow-up such as "add the top 3 of those" resolves against what the
+    user already saw instead of generating new candidates. Least recently
+    used sessions are evicted once max_entries is reached.
+    """
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_entries: int = SESSION_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _evict_expired(self, now: float):
+        # Entries are kept in last-activity order, so expired ones are at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest["updated_at"] <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if now - entry["updated_at"] > self.ttl_seconds:
+                del self._sessions[session_id]
+                return None
+            entry["updated_at"] = now
+            self._sessions.move_to_end(session_id)
+            return dict(entry)
+
+    def update(
+        self,
+        session_id: str,
+        query: str,
+        external_result: Any = None,
+        local_result: Any = None,
+        read_lsn: Optional[int] = None
+    ):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None) or {
+                "external_result": None,
+                "local_result": None
+            }
+
+            # Keep the previous result set when this turn produced none, so
+            # a chain of follow-ups keeps referring to the same candidates
+            if external_result:
+                entry["external_result"] = external_result
+            if local_result:
+                entry["local_result"] = local_result
+            if read_lsn is not None and read_lsn > (entry.get("read_lsn") or 0):
+                entry["read_lsn"] = read_lsn
+            entry["last_query"] = query
+            entry["updated_at"] = now
+
+            self._sessions[session_id] = entry
+            self._evict_expired(now)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+session_store = SessionStore()
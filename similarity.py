@@ -0,0 +1,368 @@
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from sqlalchemy import text
+import numpy as np
+import threading
+import zlib
+import re
+
+from database import read_router
+from partitions import location_key
+
+NGRAM_SIZE = 3
+FEATURE_DIM = 4096
+
+# Common recruiting abbreviations, expanded before vectorizing so that
+# "Sr. ML Eng" and "Senior Machine Learning Engineer" share n-grams
+ABBREVIATIONS = {
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "ds": "data scientist",
+    "swe": "software engineer",
+    "sde": "software development engineer",
+    "sr": "senior",
+    "jr": "junior",
+    "eng": "engineer",
+    "engg": "engineer",
+    "dev": "developer",
+    "mgr": "manager",
+    "pm": "product manager",
+    "qa": "quality assurance",
+    "ui": "user interface",
+    "ux": "user experience",
+}
+
+
+def normalize_name(value: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (value or "").lower()).split())
+
+
+def normalize_title(value: str) -> str:
+    return " ".join(ABBREVIATIONS.get(token, token) for token in normalize_name(value).split())
+
+
+def _ngram_features(normalized: str) -> np.ndarray:
+    padded = f" {normalized} "
+    grams = [padded[i:i + NGRAM_SIZE] for i in range(max(len(padded) - NGRAM_SIZE + 1, 1))]
+    return np.fromiter(
+        (zlib.crc32(g.encode()) % FEATURE_DIM for g in grams),
+        dtype=np.int32,
+        count=len(grams)
+    )
+
+
+# Rows appended since the last rebuild are scanned directly; past this many
+# they are folded into the inverted index
+DELTA_MAX_ROWS = 2048
+
+
+def _grow(array: np.ndarray, needed: int) -> np.ndarray:
+    if needed <= array.shape[0]:
+        return array
+    grown = np.zeros(max(needed, array.shape[0] * 2), dtype=array.dtype)
+    grown[:array.shape[0]] = array
+    return grown
+
+
+class SimilarityIndex:
+    """
+    In-memory character n-gram TF-IDF index over one column of people
+
+    Each distinct normalized value is stored as a sparse vector (its few
+    hashed trigram ids and IDF-weighted, L2-normalized weights) in CSR
+    arrays, plus an inverted index (CSC) from trigram to rows. A lookup
+    only touches the postings of its own trigrams, so memory grows with
+    the number of trigrams rather than rows x FEATURE_DIM. Rows added
+    after a rebuild use the IDF weights of that moment and sit in a small
+    delta that is scanned directly until it is merged.
+    """
+
+    def __init__(self, field: str, normalize: Callable[[str], str] = normalize_title):
+        self.field = field
+        self.normalize = normalize
+        self._lock = threading.RLock()
+        self._pending: Optional[List[Dict[str, Any]]] = None
+        self._reset()
+
+    def _reset(self):
+        self._df = np.zeros(FEATURE_DIM, dtype=np.int32)
+        self._keys: List[str] = []
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        # Row-major (CSR) vectors: source of truth, cheap to append to
+        self._row_ptr = np.zeros(17, dtype=np.int64)
+        self._row_idx = np.zeros(256, dtype=np.int32)
+        self._row_val = np.zeros(256, dtype=np.float32)
+        # Column-major (CSC) inverted index over rows [0, _indexed)
+        self._col_ptr = np.zeros(FEATURE_DIM + 1, dtype=np.int64)
+        self._col_rows = np.zeros(0, dtype=np.int32)
+        self._col_val = np.zeros(0, dtype=np.float32)
+        self._indexed = 0
+        self._loaded = False
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _idf(self) -> np.ndarray:
+        n_docs = len(self._keys)
+        return (np.log((1 + n_docs) / (1 + self._df)) + 1).astype(np.float32)
+
+    def _vectorize(self, value: str, idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        features, counts = np.unique(_ngram_features(value), return_counts=True)
+        weights = (1 + np.log(counts)).astype(np.float32) * idf[features]
+        norm = np.linalg.norm(weights)
+        return features.astype(np.int32), weights / (norm or 1)
+
+    def _append_row(self, features: np.ndarray, weights: np.ndarray):
+        row = len(self._keys) - 1
+        start = int(self._row_ptr[row])
+        end = start + len(features)
+        self._row_ptr = _grow(self._row_ptr, row + 2)
+        self._row_idx = _grow(self._row_idx, end)
+        self._row_val = _grow(self._row_val, end)
+        self._row_idx[start:end] = features
+        self._row_val[start:end] = weights
+        self._row_ptr[row + 1] = end
+
+    def _build_inverted(self):
+        n_rows = len(self._keys)
+        nnz = int(self._row_ptr[n_rows])
+        features = self._row_idx[:nnz]
+        rows = np.repeat(np.arange(n_rows, dtype=np.int32), np.diff(self._row_ptr[:n_rows + 1]))
+        order = np.argsort(features, kind="stable")
+        self._col_rows = rows[order]
+        self._col_val = self._row_val[:nnz][order]
+        self._col_ptr = np.zeros(FEATURE_DIM + 1, dtype=np.int64)
+        self._col_ptr[1:] = np.cumsum(np.bincount(features, minlength=FEATURE_DIM))
+        self._indexed = n_rows
+
+    def begin_rebuild(self):
+        """Captures add() calls made while the rebuild's rows are being read"""
+        with self._lock:
+            self._pending = []
+
+    def abort_rebuild(self):
+        with self._lock:
+            self._pending = None
+
+    def rebuild(self, records: List[Dict[str, Any]]):
+        with self._lock:
+            pending, self._pending = self._pending or [], None
+            self._reset()
+            for record in records:
+                key = self.normalize(record.get(self.field))
+                if not key:
+                    continue
+                if key not in self._records:
+                    self._keys.append(key)
+                    self._records[key] = []
+                    self._df[np.unique(_ngram_features(key))] += 1
+                self._records[key].append(record)
+
+            idf = self._idf()
+            vectors = [self._vectorize(key, idf) for key in self._keys]
+            self._row_ptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+            self._row_ptr[1:] = np.cumsum([len(features) for features, _ in vectors])
+            if vectors:
+                self._row_idx = np.concatenate([features for features, _ in vectors])
+                self._row_val = np.concatenate([weights for _, weights in vectors])
+            self._build_inverted()
+            self._loaded = True
+
+            for record in pending:
+                self.add(record)
+
+    def add(self, record: Dict[str, Any]):
+        key = self.normalize(record.get(self.field))
+        if not key:
+            return
+
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(record)
+            if key in self._records:
+                self._records[key].append(record)
+                return
+
+            self._keys.append(key)
+            self._records[key] = [record]
+            self._df[np.unique(_ngram_features(key))] += 1
+            self._append_row(*self._vectorize(key, self._idf()))
+
+            if len(self._keys) - self._indexed > DELTA_MAX_ROWS:
+                self._build_inverted()
+
+    def _scores(self, features: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(row ids, cosine scores) of every row sharing a trigram with the query"""
+        starts = self._col_ptr[features]
+        ends = self._col_ptr[features + 1]
+        rows = np.concatenate([self._col_rows[s:e] for s, e in zip(starts, ends)] or [np.zeros(0, np.int32)])
+        values = np.concatenate([
+            self._col_val[s:e] * w for s, e, w in zip(starts, ends, weights)
+        ] or [np.zeros(0, np.float32)])
+        rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=values, minlength=len(rows))
+
+        n_rows = len(self._keys)
+        if self._indexed < n_rows:
+            query = np.zeros(FEATURE_DIM, dtype=np.float32)
+            query[features] = weights
+            start, end = int(self._row_ptr[self._indexed]), int(self._row_ptr[n_rows])
+            products = self._row_val[start:end] * query[self._row_idx[start:end]]
+            delta_scores = np.add.reduceat(products, self._row_ptr[self._indexed:n_rows] - start)
+            rows = np.concatenate([rows, np.arange(self._indexed, n_rows)])
+            scores = np.concatenate([scores, delta_scores])
+
+        return rows, scores
+
+    def search_many(
+        self,
+        values: List[str],
+        k: int = 5,
+        threshold: float = 0.0
+    ) -> List[List[Tuple[str, float]]]:
+        """Batched top-k cosine search; returns (normalized key, score) pairs per value"""
+        with self._lock:
+            if not values or not self._keys:
+                return [[] for _ in values]
+
+            idf = self._idf()
+            results = []
+            for value in values:
+                rows, scores = self._scores(*self._vectorize(self.normalize(value), idf))
+                keep = scores >= threshold
+                rows, scores = rows[keep], scores[keep]
+                if len(rows) > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    rows, scores = rows[top], scores[top]
+                ranked = np.argsort(-scores)
+                results.append([(self._keys[rows[i]], float(scores[i])) for i in ranked])
+            return results
+
+    def search(self, value: str, k: int = 5, threshold: float = 0.0) -> List[Tuple[str, float]]:
+        return self.search_many([value], k, threshold)[0]
+
+    def records_for(self, key: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records.get(key, []))
+
+    def best_match(self, value: str, threshold: float) -> Optional[Tuple[str, float]]:
+        matches = self.search(value, k=1, threshold=threshold)
+        return matches[0] if matches else None
+
+
+role_index = SimilarityIndex("role")
+# Names are not expanded: "Dev Patel" must not be indexed as "developer patel"
+name_index = SimilarityIndex("name", normalize_name)
+
+_load_lock = threading.Lock()
+
+
+def load_people_indexes(force: bool = False) -> bool:
+    """Builds the role and name indexes from the people table (once unless forced)"""
+    with _load_lock:
+        if role_index.loaded and name_index.loaded and not force:
+            return True
+
+        role_index.begin_rebuild()
+        name_index.begin_rebuild()
+        try:
+            rows = read_router.run_read(
+                lambda conn: conn.execute(text(
+                    "SELECT name, role, location, source FROM people"
+                )).mappings().all(),
+                read_router.last_write_lsn
+            )
+        except Exception as e:
+            role_index.abort_rebuild()
+            name_index.abort_rebuild()
+            print(f"SIMILARITY Index build failed: {e}")
+            return False
+
+        records = [dict(row) for row in rows]
+        role_index.rebuild(records)
+        name_index.rebuild(records)
+
+        print(f"SIMILARITY Indexed {len(records)} people ({len(role_index)} distinct roles)")
+        return True
+
+
+def index_person(name: str, role: str, location: str, source: str = None):
+    record = {"name": name, "role": role, "location": location, "source": source}
+    if role_index.loaded:
+        role_index.add(record)
+    if name_index.loaded:
+        name_index.add(record)
+
+
+def find_similar_people(
+    roles: List[str],
+    location: str = None,
+    threshold: float = 0.5,
+    k: int = 5
+) -> List[Dict[str, Any]]:
+    """Resolves a batch of roles (and optional location) to near-matching existing people"""
+    load_people_indexes()
+
+    # Same normalization as the people partition key
+    wanted_location = location_key(location) if location else None
+    people = []
+    seen = set()
+    for matches in role_index.search_many(roles, k=k, threshold=threshold):
+        for key, score in matches:
+            for record in role_index.records_for(key):
+                if wanted_location and location_key(record.get("location")) != wanted_location:
+                    continue
+                identity = (record.get("name"), record.get("role"), record.get("location"))
+                if identity in seen:
+                    continue
+                seen.add(identity)
+                people.append({
+                    "name": record.get("name"),
+                    "role": record.get("role"),
+                    "location": record.get("location"),
+                    "similarity": round(score, 3)
+                })
+    return people
+
+
+def find_duplicate_names(
+    names: List[str],
+    threshold: float,
+    locations: List[Optional[str]] = None,
+    k: int = 5
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Closest existing name above threshold for each of a batch of names
+
+    When locations are given, matches are limited to the same location
+    partition as the corresponding name. One search_many call per batch.
+    """
+    load_people_indexes()
+
+    locations = locations or [None] * len(names)
+    duplicates = []
+    for matches, location in zip(name_index.search_many(names, k=k, threshold=threshold), locations):
+        wanted_location = location_key(location) if location else None
+        duplicate = None
+        for key, score in matches:
+            for record in name_index.records_for(key):
+                if wanted_location and location_key(record.get("location")) != wanted_location:
+                    continue
+                duplicate = {**record, "similarity": round(score, 3)}
+                break
+            if duplicate:
+                break
+        duplicates.append(duplicate)
+    return duplicates
+
+
+def find_duplicate_name(
+    name: str,
+    threshold: float,
+    location: str = None,
+    k: int = 5
+) -> Optional[Dict[str, Any]]:
+    return find_duplicate_names([name], threshold, [location], k)[0]
@@ -0,0 +1,133 @@
+from typing import Dict, Any, Optional
+from collections import Counter
+from sqlalchemy import text
+import threading
+import time
+
+from constants import STATS_RECONCILE_INTERVAL
+from database import read_router
+from cache import bump_data_version
+from similarity import load_people_indexes
+
+DEFAULT_SOURCE = "manual"
+
+
+class PeopleStats:
+    """
+    Incrementally maintained aggregates over the people table
+
+    Every insert path calls record_insert(), so the hybrid summary
+    (total people, counts by source, top roles) is served from memory
+    without an LLM call or a full-table aggregation. reconcile() reloads
+    the counters from Postgres to correct any drift (inserts made outside
+    this process, failed writes, restarts).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = 0
+        self._by_source: Counter = Counter()
+        self._by_role: Counter = Counter()
+        self._loaded = False
+        self._last_reconciled: Optional[float] = None
+
+    def record_insert(self, role: Optional[str], source: Optional[str] = None):
+        with self._lock:
+            self._total += 1
+            self._by_source[source or DEFAULT_SOURCE] += 1
+            if role:
+                self._by_role[role] += 1
+
+    def summary(self, top_n: int = 3) -> Dict[str, Any]:
+        if not self._loaded and not self.reconcile():
+            # Until one reconcile succeeds the counters only hold this
+            # process's own inserts, which are not a summary of the table
+            return {"available": False, "message": "Summary unavailable", "last_reconciled": None}
+
+        with self._lock:
+            return {
+                "available": True,
+                "total_people": self._total,
+                "by_source": dict(self._by_source),
+                "top_roles": [
+                    {"role": role, "count": count}
+                    for role, count in self._by_role.most_common(top_n)
+                ],
+                "last_reconciled": self._last_reconciled
+            }
+
+    def reconcile(self) -> bool:
+        def aggregate(conn):
+            source_rows = conn.execute(text(
+                f"SELECT COALESCE(source, '{DEFAULT_SOURCE}'), COUNT(*) "
+                "FROM people GROUP BY 1"
+            )).fetchall()
+            role_rows = conn.execute(text(
+                "SELECT role, COUNT(*) FROM people "
+                "WHERE role IS NOT NULL GROUP BY role"
+            )).fetchall()
+            return source_rows, role_rows
+
+        try:
+            # A replica is fine as long as it has this process's writes;
+            # an older snapshot would make the counters go backwards
+            source_rows, role_rows = read_router.run_read(aggregate, read_router.last_write_lsn)
+        except Exception as e:
+            print(f"STATS Reconciliation failed: {e}")
+            return False
+
+        by_source = Counter({src: count for src, count in source_rows})
+        by_role = Counter({role: count for role, count in role_rows})
+
+        with self._lock:
+            was_loaded = self._loaded
+            drift = sum(by_source.values()) - self._total
+            self._total = sum(by_source.values())
+            self._by_source = by_source
+            self._by_role = by_role
+            self._loaded = True
+            self._last_reconciled = time.time()
+
+        # Drift means rows changed outside this process (other workers,
+        # migrations, manual SQL): the similarity indexes are missing them
+        # and cached reads are stale
+        if drift and was_loaded:
+            load_people_indexes(force=True)
+        if drift:
+            bump_data_version()
+
+        print(f"STATS Reconciled: {self._total} people (drift {drift:+d})")
+        return True
+
+
+people_stats = PeopleStats()
+
+_reconcile_thread: Optional[threading.Thread] = None
+_reconcile_stop = threading.Event()
+
+
+def _reconcile_loop(interval: float):
+    people_stats.reconcile()
+    while not _reconcile_stop.wait(interval):
+        people_stats.reconcile()
+
+
+def start_reconciliation(interval: float = STATS_RECONCILE_INTERVAL):
+    """Starts the periodic drift-correction job (no-op if already running)"""
+    global _reconcile_thread
+
+    if interval <= 0 or (_reconcile_thread and _reconcile_thread.is_alive()):
+        return
+
+    _reconcile_stop.clear()
+    _reconcile_thread = threading.Thread(
+        target=_reconcile_loop,
+        args=(interval,),
+        name="stats-reconcile",
+        daemon=True
+    )
+    _reconcile_thread.start()
+
+
+def stop_reconciliation():
+    _reconcile_stop.set()
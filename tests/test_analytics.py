@@ -0,0 +1,42 @@
+from analytics import extract_location, parse_aggregate_query, aggregate_sql, location_label
+
+
+def test_extracts_location_in_any_case():
+    for query, location in [("how many people in pune", "pune"), ("how many people in Pune?", "Pune"),
+                            ("count people in new delhi by role", "new delhi"),
+                            ("count people from San Francisco, per source", "San Francisco")]:
+        assert extract_location(query) == location, query
+
+
+def test_filler_after_in_is_not_a_location():
+    for query in ["how many people in the database", "how many people in total?",
+                  "how many people in each city", "count people by location"]:
+        assert extract_location(query) is None, query
+
+
+def test_group_by_every_listed_dimension():
+    for query, group_by in [("count people by location", ["location"]),
+                            ("total people by role and location", ["role", "location"]),
+                            ("number of people per city, role and source", ["location", "role", "source"]),
+                            ("count people in new delhi by role", ["role"])]:
+        assert parse_aggregate_query(query)["group_by"] == group_by, query
+
+
+def test_role_filtered_counts():
+    for query, role, location in [("How many engineers are in Mumbai?", "engineer", "Mumbai"),
+                                  ("how many ML engineers do we have in Pune", "ml engineer", "Pune"),
+                                  ("how many people in pune", None, "pune")]:
+        spec = parse_aggregate_query(query)
+        assert (spec["role"], spec["location"]) == (role, location), query
+
+
+def test_non_aggregates_fall_through():
+    for query in ["Show engineers in Mumbai", "List top engineers", "Find ML engineers in Seattle and save them"]:
+        assert parse_aggregate_query(query) is None, query
+
+
+def test_location_filter_uses_normalized_key():
+    sql = aggregate_sql(parse_aggregate_query("how many people in New-Delhi"), "location_key")
+    assert "location_key = 'new_delhi'" in sql
+    assert location_label("new_delhi") == "New Delhi"
+    assert location_label("unknown") is None
@@ -0,0 +1,50 @@
+from candidates import parse_candidate_line, iter_compact_candidates
+
+
+def test_parses_plain_row():
+    assert parse_candidate_line("Priya Sharma|ML Engineer|San Francisco") == {
+        "name": "Priya Sharma",
+        "role": "ML Engineer",
+        "location": "San Francisco",
+        "source": "external"
+    }
+
+
+def test_strips_bullets_numbering_and_padding():
+    for line in ["- Priya Sharma | ML Engineer | Pune", "2. Priya Sharma|ML Engineer|Pune",
+                 "| Priya Sharma | ML Engineer | Pune |", "  `Priya Sharma|ML Engineer|Pune`  "]:
+        candidate = parse_candidate_line(line)
+        assert candidate["name"] == "Priya Sharma"
+        assert candidate["location"] == "Pune"
+
+
+def test_extra_columns_are_ignored():
+    candidate = parse_candidate_line("Priya Sharma|ML Engineer|Pune|external")
+    assert candidate["location"] == "Pune"
+
+
+def test_rejects_malformed_rows():
+    for line in ["", "Here are the candidates:", "Priya Sharma|ML Engineer",
+                 "Priya Sharma||Pune", "name|role|location", "---|---|---", "123|456|789"]:
+        assert parse_candidate_line(line) is None, line
+
+
+def test_iter_yields_rows_split_across_chunks():
+    chunks = ["Priya Sha", "rma|ML Engineer|Pu", "ne\nMichael Chen|Data", " Scientist|Boston"]
+    names = [c["name"] for c in iter_compact_candidates(chunks)]
+    assert names == ["Priya Sharma", "Michael Chen"]
+
+
+def test_iter_skips_malformed_lines_between_rows():
+    text = "Sure! Here you go:\nname|role|location\nPriya Sharma|ML Engineer|Pune\n\noops\nMichael Chen|SWE|Boston\n"
+    names = [c["name"] for c in iter_compact_candidates([text])]
+    assert names == ["Priya Sharma", "Michael Chen"]
+
+
+def test_iter_yields_candidate_as_soon_as_line_completes():
+    def chunks():
+        yield "Priya Sharma|ML Engineer|Pune\nMichael"
+        raise AssertionError("stream read past the first complete row")
+
+    candidates = iter_compact_candidates(chunks())
+    assert next(candidates)["name"] == "Priya Sharma"
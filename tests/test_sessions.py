@@ -0,0 +1,20 @@
+from sessions import is_followup_reference
+
+
+def test_detects_followups():
+    for query in ["add the top 3 of those", "add the top 3 of those to the team", "save them",
+                  "Add them to our database", "show me those again", "insert the first 2 of the above",
+                  "add all of these candidates please"]:
+        assert is_followup_reference(query), query
+
+
+def test_searches_are_not_followups():
+    for query in ["Find ML engineers in Seattle and save them", "Search for data scientists and add them",
+                  "get me 5 designers in Pune and add them"]:
+        assert not is_followup_reference(query), query
+
+
+def test_new_content_is_not_a_followup():
+    for query in ["add those who are in Boston", "add the top 3 of those data scientists from Pune",
+                  "Show me all people in the database", "", None]:
+        assert not is_followup_reference(query), query
@@ -0,0 +1,150 @@
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from concurrent.futures import Future
+from sqlalchemy import text
+import queue
+import threading
+import time
+
+from constants import WRITE_BATCH_WINDOW_MS, WRITE_BATCH_MAX_SIZE
+from database import get_engine, read_router
+from partitions import partition_manager
+
+
+class GroupCommitWriter:
+    """
+    Combines concurrent single-row inserts into one transaction
+
+    Callers block on their own Future while a background thread gathers
+    every insert that arrives within window_ms (or until max_batch rows)
+    and commits them together. The batch is first written with one
+    executemany per column set; if that fails, it is retried row by row
+    under savepoints so each caller still gets its own success or error.
+    prepare, if given, runs on each batch's rows before the transaction
+    opens (e.g. to fill partition keys and create missing partitions).
+    """
+
+    def __init__(
+        self,
+        table: str = "people",
+        window_ms: float = WRITE_BATCH_WINDOW_MS,
+        max_batch: int = WRITE_BATCH_MAX_SIZE,
+        prepare: Callable[[List[Dict[str, Any]]], None] = None
+    ):
+        self.table = table
+        self.prepare = prepare
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[Dict[str, Any], Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"group-commit-{self.table}",
+                daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, row: Dict[str, Any]) -> Future:
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((row, future))
+        return future
+
+    def insert(self, row: Dict[str, Any], timeout: Optional[float] = None):
+        """
+        Inserts one row and blocks until its batch is committed
+
+        Returns the commit LSN when read replicas are configured (for
+        read-your-writes routing), otherwise None.
+        """
+        return self.submit(row).result(timeout=timeout)
+
+    def _collect(self) -> List[Tuple[Dict[str, Any], Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _insert_sql(self, columns: Tuple[str, ...]):
+        return text(
+            f"INSERT INTO {self.table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + c for c in columns)})"
+        )
+
+    def _write_grouped(self, batch):
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row, _ in batch:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        with get_engine().begin() as conn:
+            for columns, rows in groups.items():
+                conn.execute(self._insert_sql(columns), rows)
+
+        commit_lsn = read_router.note_write()
+        for _, future in batch:
+            future.set_result(commit_lsn)
+
+    def _write_individually(self, batch):
+        with get_engine().begin() as conn:
+            outcomes = []
+            for row, future in batch:
+                savepoint = conn.begin_nested()
+                try:
+                    conn.execute(self._insert_sql(tuple(sorted(row))), row)
+                    savepoint.commit()
+                    outcomes.append((future, None))
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((future, e))
+
+        commit_lsn = read_router.note_write()
+        for future, error in outcomes:
+            if error is None:
+                future.set_result(commit_lsn)
+            else:
+                future.set_exception(error)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if self.prepare:
+                try:
+                    self.prepare([row for row, _ in batch])
+                except Exception as e:
+                    print(f"WRITER Batch preparation failed: {e}")
+            try:
+                self._write_grouped(batch)
+                print(f"WRITER Committed batch of {len(batch)}")
+            except Exception as e:
+                print(f"WRITER Batch of {len(batch)} failed ({type(e).__name__}), retrying row by row")
+                try:
+                    self._write_individually(batch)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+
+
+def _prepare_people_rows(rows: List[Dict[str, Any]]):
+    for row in rows:
+        row.update(partition_manager.key_values(row.get("location")))
+    partition_manager.ensure(row.get("location") for row in rows)
+
+
+people_writer = GroupCommitWriter(prepare=_prepare_people_rows)